@@ -5,10 +5,17 @@ Now that hardware PWM is working, here are practical examples
 """
 
 from periphery import PWM
+import os
 import time
 import signal
 import sys
 
+# Frequency changes go through the car's PWM library (src/), which keeps
+# the duty ratio and never lets duty exceed the period mid-change
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from pwm_lib import ToneTable
+from pwmbackend_lib import PeripheryPWMPin
+
 class HardwarePWMController:
     def __init__(self, chip=0, channel=0):
         """
@@ -74,9 +81,9 @@ def servo_motor_control():
     """Example 2: Servo motor control"""
     print("\n=== Servo Motor Control Example ===")
     
-    pwm = HardwarePWMController(0, 0)
-    pwm.set_frequency(50)  # 50Hz for servo control
-    pwm.enable()
+    pwm = PeripheryPWMPin("servo", 0, 0)
+    if not pwm.start(1000):
+        return
     
     try:
         # Servo positions (duty cycles for standard servos)
@@ -86,6 +93,10 @@ def servo_motor_control():
             "right": 10.0,   # 2.0ms pulse width
         }
         
+        # 50Hz for servo control, straight to the center pulse: period and
+        # duty are written in an order that never produces an invalid waveform
+        pwm.retune(50, positions["center"])
+        
         # Move servo to different positions
         for position_name, duty in positions.items():
             print(f"Moving servo to {position_name} position")
@@ -103,7 +114,7 @@ def servo_motor_control():
             time.sleep(0.1)
             
     finally:
-        pwm.close()
+        pwm.stop(unexport=True)
 
 def motor_speed_control():
     """Example 3: DC motor speed control"""
@@ -169,9 +180,10 @@ def pwm_frequency_demo():
     print("\n=== PWM Frequency Demonstration ===")
     print("(Connect a buzzer or speaker to hear different frequencies)")
     
-    pwm = HardwarePWMController(0, 0)
+    pwm = PeripheryPWMPin("buzzer", 0, 0)
+    if not pwm.start(1000):
+        return
     pwm.set_duty_cycle(50)  # 50% duty cycle for audio
-    pwm.enable()
     
     try:
         # Musical notes frequencies (Hz)
@@ -185,20 +197,22 @@ def pwm_frequency_demo():
             "B4": 494,
             "C5": 523
         }
+        # Period/duty pairs computed once; each note stays at 50% duty
+        tones = ToneTable(notes.values(), duty_percent=50)
         
         for note_name, frequency in notes.items():
             print(f"Playing {note_name} ({frequency}Hz)")
-            pwm.set_frequency(frequency)
+            tones.play(pwm, frequency)
             time.sleep(0.5)
             
-        # Frequency sweep
+        # Frequency sweep, keeping the duty ratio at every step
         print("Frequency sweep from 100Hz to 2000Hz...")
         for freq in range(100, 2001, 50):
-            pwm.set_frequency(freq)
+            pwm.retune(freq)
             time.sleep(0.1)
             
     finally:
-        pwm.close()
+        pwm.stop(unexport=True)
 
 def interactive_pwm_control():
     """Example 6: Interactive PWM control"""
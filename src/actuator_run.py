@@ -0,0 +1,340 @@
+# Actuator process for split mode: owns the PWM/GPIO handles and the timing
+# loops, and applies commands forwarded by the BLE front-end (auto_run.py --split).
+# build_actuators() is also used by auto_run.py in single-process mode.
+
+from bt_lib import BT
+from pin_lib import PIN
+from pwm_lib import PWMController, backend_candidates
+from control_lib import DeadlineScheduler, RampedOutput
+from drive_lib import DriveMixer
+from arbiter_lib import InputArbiter
+from watchdog_lib import DeadmanWatchdog
+from estop_lib import EmergencyStop
+from timeline_lib import TimelinePlayer, TimelineUpload
+from macro_lib import MacroStore
+from clock_lib import CommandQueue
+from state_lib import StateSync, parse_percent
+from handoff_lib import HandoffServer, InheritedLine, Takeover
+from checkpoint_lib import CHECKPOINT_PATH, RESTORE_POLICY, Checkpoint
+from probe_lib import ProbeCache
+import signal
+import sys
+
+# Input sources in priority order (higher wins) and their freshness timeouts
+SOURCES = (
+    ("timeline", 3, None),  # uploaded trajectories, released when playback ends
+    ("ble", 2, None),   # the phone: holds its last command
+    ("net", 1, 0.5),    # UDP joystick streams at 100+ Hz
+    ("auto", 0, 0.5),   # autonomous controllers
+)
+# Timeline player outputs, by index, as named in macros.json
+OUTPUTS = {"left": 0, "right": 1, "lamps": 2}
+# Macros play as the "timeline" source, which outranks the phone: a demo
+# must never hold the motors, so macros.json only gets the lamps
+MACRO_OUTPUTS = {"lamps": OUTPUTS["lamps"]}
+
+def build_actuators(bt, realtime=None, deadman_s=None, estop_gpio=None, takeover=None,
+                    checkpoint_path=CHECKPOINT_PATH, restore_policy=RESTORE_POLICY,
+                    pwm_backend="sysfs"):
+    """Create PIN/PWM/control loop and wire them into bt's dispatcher hooks"""
+    state = takeover.state if takeover else None
+    # Last known outputs from the checkpoint file; a takeover carries its own
+    checkpoint, saved = None, None
+    if checkpoint_path:
+        try:
+            checkpoint = Checkpoint(checkpoint_path)
+            saved = checkpoint.load()  # also resumes the record sequence
+            if state:
+                saved = None
+        except OSError as e:
+            print(f"⚠️  Checkpoint unavailable: {e}")
+    #Create PIN controller
+    if state and state['gpio']:
+        # Hot restart: keep driving the line the old process requested
+        pin = PIN(line=InheritedLine(takeover.fd(state['gpio']['fd'])))
+    else:
+        pin = PIN()
+    # Create PWM controller
+    # Chip/channel per header pin, re-probed only when kernel/uEnv/overlays change
+    probe = ProbeCache()
+    probe.load()
+    print(f"🔎 Hardware probe {'cached' if probe.hit else 'refreshed'} ({probe.load_s * 1000:.1f}ms)")
+    for problem in probe.results['problems']:
+        print(f"⚠️  {problem}")
+    pwm = PWMController(backend=pwm_backend, pin_map=probe.pin_map())
+    if state:
+        entries = {entry['name']: entry for entry in state['pwm']}
+        for channel in pwm.pins:
+            entry = entries.get(channel.name)
+            if entry and channel.backend != entry.get('backend', "sysfs"):
+                raise RuntimeError(f"{entry['name']} was handed over as {entry['backend']}: "
+                                   f"start the successor with --pwm={entry['backend']}")
+            if entry and entry['fd'] is not None:
+                channel.adopt_fd(takeover.fd(entry['fd']), entry['period_ns'], entry['duty_percent'])
+                continue
+            # No descriptor to inherit (periphery, software, fake) or the pin
+            # was not running: start it here, at the old waveform if there was one
+            print(f"⚠️  {channel.name} not handed over: starting it ({channel.backend})")
+            if not channel.start(1000000000 / entry['period_ns'] if entry else pwm.frequency):
+                # e.g. a software PWM line is still requested by the old process
+                raise RuntimeError(f"{channel.name} ({channel.backend}) cannot be taken over: "
+                                   f"restart without --takeover")
+            if entry:
+                channel.set_duty_cycle(entry['duty_percent'])
+    else:
+        pwm.start_pwm()
+    if saved:
+        pwm.restore(saved['pwm'], restore_policy)
+        pin.restore(saved['gpio'], restore_policy)
+
+    # Shared control tick: arbiters pick a source, then the motor duties ramp
+    # locally towards the winning endpoint
+    control = DeadlineScheduler(rate_hz=200, name="control", realtime=realtime)
+    # No writes for steps finer than the backend can express (e.g. software PWM)
+    left_ramp = RampedOutput("left", pwm.set_p8_13_duty, accel=200, decel=400,
+                             resolution=max(0.5, pwm.duty_step(pwm.p8_13)))
+    right_ramp = RampedOutput("right", pwm.set_p8_19_duty, accel=200, decel=400,
+                              resolution=max(0.5, pwm.duty_step(pwm.p8_19)))
+    left_arbiter = InputArbiter("left", left_ramp.set_target)
+    right_arbiter = InputArbiter("right", right_ramp.set_target)
+    for name, priority, timeout_s in SOURCES:
+        left_arbiter.add_source(name, priority, timeout_s)
+        right_arbiter.add_source(name, priority, timeout_s)
+
+    # 'at' commands due this tick are applied before anything reads the inputs
+    commands = CommandQueue()
+    control.add_task(commands.update)
+
+    # Uploaded trajectories play on the control tick: left, right, lamps
+    player = TimelinePlayer(
+        [left_arbiter.writer("timeline"), right_arbiter.writer("timeline"), pwm.set_p9_14_duty],
+        notify=bt.send_to_iphone,
+        on_stop=lambda: (left_arbiter.release("timeline"), right_arbiter.release("timeline")),
+        lock=control.lock)
+    control.add_task(player.update)
+    # Named macros from macros.json, recompiled whenever the file changes
+    macros = MacroStore(player, MACRO_OUTPUTS)
+    macros.reload()
+    macros.start_watching()
+
+    # Dead-man: a motor whose commands stop arriving stops at once, no ramp
+    watchdog = None
+    if deadman_s:
+        watchdog = DeadmanWatchdog(deadman_s, lock=control.lock)
+        watchdog.guard("left", lambda: (left_arbiter.release_all(), left_ramp.jump(0)))
+        watchdog.guard("right", lambda: (right_arbiter.release_all(), right_ramp.jump(0)))
+        control.add_task(watchdog.update)
+
+    # The phone is gone: its held commands must not outrank net/auto forever
+    def on_disconnect():
+        with control.lock:
+            left_arbiter.release("ble")
+            right_arbiter.release("ble")
+        if watchdog:
+            watchdog.expire_all()
+
+    bt.on_disconnect = on_disconnect
+
+    control.add_task(left_arbiter.update)
+    control.add_task(right_arbiter.update)
+    control.add_task(left_ramp.update)
+    control.add_task(right_ramp.update)
+    if state:
+        # Carry on from the old process's values instead of ramping up from zero
+        for side, arbiter, ramp in (("left", left_arbiter, left_ramp), ("right", right_arbiter, right_ramp)):
+            ramp.hold(state['ramps'][side])
+            for source, value in state['sources'][side].items():
+                arbiter.submit(source, value)
+        if state['gpio']:
+            pin.p9_12_mode = state['gpio']['mode']
+            if pin.p9_12_mode == 2:
+                pin.set_pin_9_12(2)  # restart the blink thread
+    elif saved:
+        # Restored motor duties are held like a last BLE command
+        for arbiter, ramp, channel in ((left_arbiter, left_ramp, pwm.p8_13), (right_arbiter, right_ramp, pwm.p8_19)):
+            if channel.duty_percent:
+                ramp.hold(channel.duty_percent)
+                arbiter.submit("ble", channel.duty_percent)
+    control.start()
+
+    # E-stop: zero every PWM and the motor GPIO, then halt the control tick.
+    # Release restarts from zero rather than the last commanded speeds.
+    def resume():
+        commands.clear()
+        player.stop(reason=None)
+        for arbiter, ramp in ((left_arbiter, left_ramp), (right_arbiter, right_ramp)):
+            arbiter.release_all()
+            ramp.jump(0)
+        control.resume()
+
+    estop = EmergencyStop()
+    estop.add_pwm(*pwm.pins)
+    estop.add_line(pin.P9_12)
+    estop.add_latch(control.halt, resume)
+    estop.add_latch(pin.motor_stop_event.set)
+    estop.add_latch(lambda: setattr(pin, 'p9_12_mode', 0))  # the line was driven low
+    if estop_gpio:
+        estop.watch_gpio(*estop_gpio)
+    if state and state['estop_engaged']:
+        estop.trigger()
+    if checkpoint:
+        # An e-stop is not persisted: the last state before it stays on file
+        checkpoint.start(lambda: None if estop.engaged else
+                         {'pwm': pwm.checkpoint(), 'gpio': pin.p9_12_mode})
+
+    actuators = {
+        'pin': pin, 'pwm': pwm, 'control': control, 'watchdog': watchdog, 'estop': estop,
+        'left_arbiter': left_arbiter, 'right_arbiter': right_arbiter,
+        'left_ramp': left_ramp, 'right_ramp': right_ramp,
+        'player': player, 'upload': TimelineUpload(player), 'macros': macros,
+        'commands': commands, 'checkpoint': checkpoint,
+        'drives': {},
+    }
+    wire_dispatcher(bt, actuators, "ble")
+    return actuators
+
+def wire_dispatcher(bt, actuators, source):
+    """Point a dispatcher's hooks at the actuators on behalf of one input source"""
+    left_arbiter = actuators['left_arbiter']
+    right_arbiter = actuators['right_arbiter']
+    left_write = left_arbiter.writer(source)
+    right_write = right_arbiter.writer(source)
+    left_control = left_arbiter.control(source)
+    right_control = right_arbiter.control(source)
+
+    watchdog = actuators['watchdog']
+    if watchdog:
+        # Every command on a motor pushes that motor's dead-man deadline out
+        left_write = watchdog.wrap("left", left_write)
+        right_write = watchdog.wrap("right", right_write)
+        left_control = watchdog.wrap("left", left_control)
+        right_control = watchdog.wrap("right", right_control)
+
+    # forward/turn commands submit both wheels as one pair inside a single tick
+    drive = DriveMixer(left_write, right_write, lock=actuators['control'].lock)
+    actuators['drives'][source] = drive
+
+    def lamps_control(duration, key):
+        # The compiled 'lamps' macro plays on the control tick; the blocking
+        # routine is only the fallback when macros.json does not define it
+        if not actuators['macros'].play(key):
+            actuators['pwm'].set_pin_9_14(duration, key)
+
+    # 'state' frames: the whole output vector, diffed against the shadow state
+    pin, pwm, player, macros = actuators['pin'], actuators['pwm'], actuators['player'], actuators['macros']
+
+    def parse_gpio(text):
+        if text not in ("0", "1", "2"):
+            raise ValueError(f"gpio must be 0, 1 or 2, got {text}")
+        return int(text)
+
+    def parse_effect(text):
+        if text != "-" and text not in macros.macros:
+            raise ValueError(f"unknown effect '{text}'")
+        return text
+
+    state = StateSync(lock=actuators['control'].lock)
+    state.add_field("left", lambda: left_arbiter.value_of(source) or 0, left_write, parse=parse_percent)
+    state.add_field("right", lambda: right_arbiter.value_of(source) or 0, right_write, parse=parse_percent)
+    state.add_field("lamps", lambda: pwm.p9_14.duty_percent, pwm.set_p9_14_duty, parse=parse_percent)
+    # set_pin_9_12 sleeps while the line settles: keep it out of the locked pass
+    state.add_field("gpio", lambda: pin.p9_12_mode, pin.set_pin_9_12, parse=parse_gpio, batched=False)
+    state.add_field("effect", lambda: player.timeline.name if player.playing else "-",
+                    lambda name: player.stop(reason=None) if name == "-" else macros.play(name),
+                    parse=parse_effect)
+
+    bt.estop = actuators['estop']
+    bt.lamps_control = lamps_control
+    bt.left_control = left_control
+    bt.right_control = right_control
+    bt.drive_control = drive.control
+    bt.traj_control = actuators['upload'].handle
+    bt.macro_control = actuators['macros'].handle
+    bt.schedule = actuators['commands'].at
+    bt.state_control = state.handle
+    # Last: dispatch() treats pin_control as "actuators ready"
+    bt.pin_control = actuators['pin'].set_pin_9_12  # Set custom processor
+
+def main():
+    # Dead-man timeout in seconds: --deadman=0.5
+    deadman_s = next((float(arg.split("=", 1)[1]) for arg in sys.argv
+                      if arg.startswith("--deadman=")), None)
+    # Physical stop button: --estop-gpio=/dev/gpiochip0:27
+    estop_gpio = next(((arg.split("=", 1)[1].rsplit(":", 1)[0], int(arg.rsplit(":", 1)[1]))
+                       for arg in sys.argv if arg.startswith("--estop-gpio=")), None)
+    # PWM backend: --pwm=auto|chardev|sysfs|periphery|software|fake (see pwm_lib.PWM_BACKENDS)
+    pwm_backend = next((arg.split("=", 1)[1] for arg in sys.argv
+                        if arg.startswith("--pwm=")), "sysfs")
+    try:
+        backend_candidates(pwm_backend)
+    except ValueError as e:
+        sys.exit(f"❌ --pwm: {e}")
+    realtime = None
+    if "--realtime" in sys.argv:
+        priority = next((int(arg.split("=", 1)[1]) for arg in sys.argv
+                         if arg.startswith("--rt-priority=")), 50)
+        realtime = {'priority': priority, 'cpus': [0]}
+
+    # Hot restart: --takeover adopts the outputs of a running --hot process
+    takeover = Takeover() if "--takeover" in sys.argv else None
+
+    from link_lib import ActuatorLink, EstopListener
+    # BT is only used as the command dispatcher here; no BLE server is started
+    dispatcher = BT()
+    actuators = build_actuators(dispatcher, realtime=realtime, deadman_s=deadman_s,
+                                estop_gpio=estop_gpio, takeover=takeover, pwm_backend=pwm_backend)
+    if takeover:
+        takeover.complete()  # the old process exits and frees the link socket
+    # The BLE connection lives in the front-end: it reports the drop over the link
+    link = ActuatorLink(dispatcher.dispatch, on_disconnect=dispatcher.on_disconnect)
+    # '!' from the phone skips the link's command queue on a socket of its own
+    estop_listener = EstopListener(actuators['estop'].trigger)
+    estop_listener.start()
+    # No BLE here: progress notifications go back through the front-end
+    actuators['player'].notify = link.send
+
+    # In split mode the network channel lives next to the outputs
+    net = None
+    if "--udp" in sys.argv:
+        from net_lib import NetServer
+        net_dispatcher = BT()
+        wire_dispatcher(net_dispatcher, actuators, "net")
+        net = NetServer(net_dispatcher.dispatch, unix_path="/run/autobbb/control.sock")
+        net.start()
+
+    def shutdown(sig, frame):
+        print('\n\nShutting down actuator process...')
+        link.close()
+        estop_listener.close()
+        if net:
+            net.stop()
+        actuators['control'].stop()
+        actuators['control'].report()
+        if actuators['watchdog']:
+            print(f"Watchdog: {actuators['watchdog'].get_stats()}")
+        print(f"E-stop: {actuators['estop'].get_stats()}")
+        print(f"End-to-end latency: {link.latency.summary()}, {link.dispatch_errors} dispatch errors")
+        if actuators['checkpoint']:
+            actuators['checkpoint'].close()  # before stop_all() zeroes the shadows
+            print(f"Checkpoint: {actuators['checkpoint'].get_stats()}")
+        actuators['pwm'].stop_all()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, shutdown)
+    # SIGTERM zeroes the outputs before the orderly shutdown
+    actuators['estop'].install_signal(signal.SIGTERM, then=shutdown)
+
+    def report():
+        actuators['control'].report()
+        print(f"End-to-end latency: {link.latency.summary()}, {link.dispatch_errors} dispatch errors")
+
+    if "--hot" in sys.argv:
+        HandoffServer(actuators, before_exit=report).start()
+
+    print(f"🔌 Actuator process listening on {link.local_path}")
+    if takeover:
+        print(f"🔁 Hot restart: command gap {takeover.gap_ms():.1f}ms")
+    link.serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Input-source arbitration for the BeagleBone Black toy-car
+One multiplexer per actuator decides between BLE, network and autonomous inputs
+"""
+
+import time
+
+class _Source:
+    __slots__ = ('name', 'priority', 'timeout_s', 'value', 'stamp')
+
+    def __init__(self, name, priority, timeout_s):
+        self.name = name
+        self.priority = priority
+        self.timeout_s = timeout_s  # None = never goes stale
+        self.value = None
+        self.stamp = None
+
+    def fresh(self, now):
+        return self.stamp is not None and (self.timeout_s is None or now - self.stamp <= self.timeout_s)
+
+class InputArbiter:
+    """Highest-priority fresh source wins; only the winner reaches write()"""
+
+    def __init__(self, name, write, safe_value=0):
+        self.name = name
+        self.write = write  # e.g. RampedOutput.set_target
+        self.safe_value = safe_value  # applied when no source is fresh
+        self.sources = {}
+        self._ranked = []  # sources by descending priority
+        self.winner = None
+        self.written = None
+        self.switches = 0
+
+    def add_source(self, name, priority, timeout_s=None):
+        """Register an input source; higher priority wins"""
+        self.sources[name] = _Source(name, priority, timeout_s)
+        self._ranked = sorted(self.sources.values(), key=lambda s: -s.priority)
+
+    def submit(self, source, value, now=None):
+        """Record a value from a source; takes over at once if it outranks the winner"""
+        src = self.sources[source]
+        src.value = value
+        src.stamp = time.monotonic() if now is None else now
+        if self.winner is None or src.priority >= self.winner.priority:
+            self._set_winner(src)
+
+    def release(self, source):
+        """Withdraw a source until it submits again"""
+        self.sources[source].stamp = None
+
+    def value_of(self, source):
+        """Value a source currently asks for; None once released"""
+        src = self.sources[source]
+        return src.value if src.stamp is not None else None
+
+    def release_all(self):
+        """Withdraw every source; the safe value applies until one submits"""
+        for src in self._ranked:
+            src.stamp = None
+        self.winner = None
+
+    def _set_winner(self, src):
+        if src is not self.winner:
+            self.winner = src
+            self.switches += 1
+
+    def update(self, dt=None, now=None):
+        """Control tick: keep the winner while fresh, otherwise fall back"""
+        now = time.monotonic() if now is None else now
+        winner = self.winner
+        if winner is None or not winner.fresh(now):
+            # Bounded by the fixed number of registered sources
+            winner = next((s for s in self._ranked if s.fresh(now)), None)
+            if winner is not self.winner:
+                self.winner = winner
+                self.switches += 1
+
+        value = winner.value if winner else self.safe_value
+        if value != self.written:
+            self.write(value)
+            self.written = value
+
+    def writer(self, source):
+        """Callable(value) that submits on behalf of one source"""
+        return lambda value: self.submit(source, value)
+
+    def control(self, source):
+        """BT dispatcher hook (key, value) that submits on behalf of one source"""
+        return lambda key, value: self.submit(source, value or 0)
+
+    def get_stats(self):
+        return {
+            'winner': self.winner.name if self.winner else None,
+            'value': self.written,
+            'switches': self.switches,
+        }
@@ -1,48 +1,178 @@
 # combination of pin_lib, bt_lib and auto_run receive message via bluetooth
 # and control P9_14.
+# Startup order: publish the GATT service first, bring PWM/GPIO up in a
+# worker thread meanwhile, and run Bluetooth diagnostics once advertising.
+
+from startup_lib import StartupTimer
+startup = StartupTimer()
+startup.add("interpreter", 0.0, startup.now())
+startup.track_imports()
 
-from bt_lib import BT
-from pin_lib import PIN
-from pwm_lib import PWMController
 import signal
 import sys
+import threading
+import time
+with startup.phase("imports"):
+    from bt_lib import BT
+    from ring_lib import RingProducer
+
+# Opt-in real-time mode for the control thread: --realtime [--rt-priority=N]
+REALTIME = "--realtime" in sys.argv
+RT_PRIORITY = next((int(arg.split("=", 1)[1]) for arg in sys.argv
+                    if arg.startswith("--rt-priority=")), 50)
+# Two-process mode: this process only runs BLE, actuator_run.py owns the outputs
+SPLIT = "--split" in sys.argv
+# Local UDP/Unix-socket control channel next to BLE: --udp
+UDP = "--udp" in sys.argv
+# Dead-man timeout for motor commands in seconds: --deadman=0.5
+DEADMAN_S = next((float(arg.split("=", 1)[1]) for arg in sys.argv
+                  if arg.startswith("--deadman=")), None)
+# Physical stop button: --estop-gpio=/dev/gpiochip0:27
+ESTOP_GPIO = next(((arg.split("=", 1)[1].rsplit(":", 1)[0], int(arg.rsplit(":", 1)[1]))
+                   for arg in sys.argv if arg.startswith("--estop-gpio=")), None)
+# PWM backend: --pwm=auto|chardev|sysfs|periphery|software|fake (see pwm_lib.PWM_BACKENDS)
+PWM_BACKEND = next((arg.split("=", 1)[1] for arg in sys.argv
+                    if arg.startswith("--pwm=")), "sysfs")
+if PWM_BACKEND != "sysfs":
+    # Checked here: the actuator thread would only fail once BLE is up
+    from pwm_lib import backend_candidates
+    try:
+        backend_candidates(PWM_BACKEND)
+    except ValueError as e:
+        sys.exit(f"❌ --pwm: {e}")
+# Hot restart: --hot lets a successor take over the outputs, --takeover is that successor
+HOT = "--hot" in sys.argv
+TAKEOVER = "--takeover" in sys.argv
 
 def signal_handler(sig, frame):
     print('\n\nShutting down gracefully...')
+    if 'actuators' in globals():
+        actuators['control'].stop()
+        actuators['control'].report()
+        if actuators['watchdog']:
+            print(f"Watchdog: {actuators['watchdog'].get_stats()}")
+        if actuators['checkpoint']:
+            actuators['checkpoint'].close()
+            print(f"Checkpoint: {actuators['checkpoint'].get_stats()}")
+    if 'net' in globals():
+        print(f"Network control: {net.get_stats()}")
+        net.stop()
+    if 'link' in globals():
+        print(f"Round-trip latency: {link.latency.summary()}")
+        link.close()
     if 'bt' in globals():
         bt.cleanup()
     sys.exit(0)
 
-# Set up signal handler for graceful shutdown
+def sigterm_handler(sig, frame):
+    # Zero the outputs before the orderly shutdown
+    if 'actuators' in globals():
+        actuators['estop'].trigger()
+    signal_handler(sig, frame)
+
+def start_actuators():
+    """Bring up PWM/GPIO and the control loop while BLE is already advertising"""
+    try:
+        bring_up_actuators()
+    except Exception as e:
+        # Motor commands keep getting ERROR_NO_CONTROL, now with the reason
+        import traceback
+        traceback.print_exc()
+        bt.control_error = f"{type(e).__name__}: {e}"
+        print(f"❌ Actuators failed to start: {bt.control_error}")
+        bt.send_to_iphone(f"ERROR_NO_CONTROL {bt.control_error}")
+
+def bring_up_actuators():
+    global actuators, net, takeover
+    from actuator_run import build_actuators, wire_dispatcher
+    from handoff_lib import HandoffServer, Takeover
+    if TAKEOVER:
+        with startup.phase("takeover"):
+            takeover = Takeover()
+    with startup.phase("actuators"):
+        actuators = build_actuators(
+            bt, realtime={'priority': RT_PRIORITY, 'cpus': [0]} if REALTIME else None,
+            deadman_s=DEADMAN_S, estop_gpio=ESTOP_GPIO, takeover=takeover,
+            pwm_backend=PWM_BACKEND)
+    if takeover:
+        # The old process exits now; its BLE connection drops and the phone
+        # reconnects to this one
+        takeover.complete()
+        startup.mark("takeover complete")
+    if HOT:
+        HandoffServer(actuators, before_exit=actuators['control'].report).start()
+    if UDP:
+        from net_lib import NetServer
+        # Own dispatcher so network commands arbitrate as the "net" source
+        net_dispatcher = BT()
+        wire_dispatcher(net_dispatcher, actuators, "net")
+        net = NetServer(net_dispatcher.dispatch, unix_path="/run/autobbb/control.sock")
+        net.start()
+
+def background_diagnostics():
+    """hciconfig/hcitool checks, off the path to becoming connectable"""
+    try:
+        with startup.phase("bluetooth diagnostics"):
+            bt.debug_bluetooth_status()
+            print("\n🔍 Current connection analysis:")
+            print(f"Connected device found: B0:67:B5:7C:41:CA")
+            print("This device appears to be already connected!")
+            print("If this is your iPhone, communication should work.")
+            print("\n" + "="*50)
+    except Exception as e:
+        # Informational only: the server keeps running without it
+        print(f"⚠️  Bluetooth diagnostics failed: {e}")
+    if actuator_thread:
+        actuator_thread.join()
+    if takeover and takeover.ready_ns:
+        # Commands flow again once both the outputs and the GATT server are up
+        ready_ns = max(connectable_ns, takeover.ready_ns)
+        print(f"🔁 Hot restart: command gap {takeover.gap_ms(ready_ns):.1f}ms")
+    startup.imports.uninstall()
+    startup.report()
+
+def after_advertising():
+    global connectable_ns
+    connectable_ns = time.monotonic_ns()
+    startup.mark("connectable")
+    threading.Thread(target=background_diagnostics, name="diagnostics", daemon=True).start()
+
+# Set up signal handlers for graceful shutdown
 signal.signal(signal.SIGINT, signal_handler)
+signal.signal(signal.SIGTERM, sigterm_handler)
 
 print("Starting Bluetooth Server...")
 print("Send data from your iPhone to see it here!")
 print("Press Ctrl+C to stop")
 print("=" * 50)
 
-#Create PIN controller
-pin = PIN()
-# Create PWM controller
-pwm = PWMController()
 # Create BT server with custom processor
 bt = BT()
+bt.on_advertising = after_advertising
 
-# Debug Bluetooth status first
-bt.debug_bluetooth_status()
-
-# Configure BT server
-bt.pin_control = pin.set_pin_9_12  # Set custom processor
-pwm.start_pwm()
-bt.lamps_control = pwm.set_pin_9_14
-bt.left_control = pwm.set_pin_8_13
-bt.right_control = pwm.set_pin_8_19
+actuator_thread = None
+takeover = None
+if SPLIT:
+    from link_lib import FrontendLink, RemoteEstop
+    # Forward raw commands to actuator_run.py and relay its replies
+    link = FrontendLink(on_reply=bt.send_to_iphone)
+    # '!' goes straight to the actuator's e-stop socket, ahead of queued frames
+    bt.estop = RemoteEstop()
+    bt.forward = link.forward
+    # The actuator process releases the ble source when told the phone is gone
+    bt.on_disconnect = link.disconnected
+else:
+    # Commands arriving before the outputs are up get ERROR_NO_CONTROL
+    actuator_thread = threading.Thread(target=start_actuators, name="actuators", daemon=True)
+    actuator_thread.start()
 
-print("\n🔍 Current connection analysis:")
-print(f"Connected device found: B0:67:B5:7C:41:CA")
-print("This device appears to be already connected!")
-print("If this is your iPhone, communication should work.")
-print("\n" + "="*50)
+# Publish every received command to consumer processes (see bt_receiver.py)
+with startup.phase("command ring"):
+    try:
+        bt.command_ring = RingProducer()
+    except Exception as e:
+        print(f"⚠️  Command ring unavailable: {e}")
 
 # Start the server (this will block)
-bt.start_server()
\ No newline at end of file
+startup.mark("ble server start")
+bt.start_server()
@@ -1,12 +1,18 @@
 # combination of pin_lib, bt_lib and auto_run receive message via bluetooth
 # and control P9_14.
 
-from bluezero import peripheral
 import signal
-import subprocess
-import re
 import threading
 import time
+from estop_lib import ESTOP_OPCODE
+from clock_lib import ClockSync
+
+# Commands an 'at' may schedule: they run inside the control tick, under its
+# lock, so only non-blocking actuator writes qualify (no lamps fallback
+# routine, no subprocesses, no gpio settle sleep)
+SCHEDULABLE = ("left", "right", "forward", "turn_left", "turn_right", "state")
+# Refused with ESTOP_ENGAGED until 'release': nothing they report would be applied
+ESTOP_BLOCKED = SCHEDULABLE + ("lamps", "traj", "macro", "at")
 
 class BT:
     def __init__(self):
@@ -17,9 +23,14 @@ class BT:
         self.ble_periph = None
         self.response_message = b''  # Store the response message
         self.pin_control = None  # For custom data processing function
+        self.control_error = None  # why the actuators failed to start, sent with ERROR_NO_CONTROL
         self.lamps_control = None
         self.left_control = None
         self.right_control = None
+        self.drive_control = None  # forward/turn_left/turn_right mixer
+        self.traj_control = None  # TimelineUpload.handle for 'traj ...'
+        self.macro_control = None  # MacroStore.handle for 'macro <id>'
+        self.state_control = None  # StateSync.handle for 'state ...'
         self.duty = None
         self.connected_devices = []  # Track connected devices
         self.rssi_monitoring = False  # Flag for RSSI monitoring
@@ -27,12 +38,20 @@ class BT:
         self.is_connected = False  # Track connection state
         self.notifications_enabled = False  # Track if notifications are enabled
         self.tx_characteristic = None  # Store TX characteristic reference
+        self.command_ring = None  # RingProducer: every command is published to consumers
+        self.forward = None  # FrontendLink.forward in split mode
+        self.on_disconnect = None  # releases the ble input source (build_actuators, or via the link in split mode)
+        self.estop = None  # EmergencyStop, triggered ahead of every queue
+        self.clock_sync = ClockSync()  # phone clock offset/RTT for this connection
+        self.schedule = None  # CommandQueue.at for 'at <t_phone_ms> <command>'
+        self.on_advertising = None  # runs once the GATT service is published
         
     def connection_cb(self, device_path):
         """Callback when a device connects"""
         print(f"Device connected: {device_path}")
         self.is_connected = True
         self.connected_devices.append(device_path)
+        self.clock_sync.reset()
         print("BBB is now connected to iPhone")
     
     def disconnection_cb(self, device_path):
@@ -41,6 +60,8 @@ class BT:
         self.is_connected = False
         if device_path in self.connected_devices:
             self.connected_devices.remove(device_path)
+        if self.on_disconnect:
+            self.on_disconnect()
         print("BBB disconnected from iPhone")
     
     def notification_cb(self, characteristic_path, enabled):
@@ -49,16 +70,40 @@ class BT:
         self.notifications_enabled = enabled
     
     def rx_write_cb(self, value, options):
+        if self.estop and value[:1] == ESTOP_OPCODE:
+            self.estop.trigger()
+            return
+        t_rx_ns = time.monotonic_ns()
+        if self.forward:
+            # Split mode: the actuator process applies it and replies
+            self.forward(bytes(value), t_rx_ns)
+            if self.command_ring:
+                self.command_ring.publish(bytes(value))
+            return
+        if self.command_ring:
+            self.command_ring.publish(bytes(value))
         print(f"📱 Received from iPhone: {value.decode()}")
         print(f"⏰ Time: {time.strftime('%H:%M:%S')}")
         # Process your data here directly
-        self.process_received_data(value.decode())
+        self.process_received_data(value.decode(), t_rx_ns)
     
-    def process_received_data(self, message):
-        """Process the received data - use custom processor if available"""
-        print(f"🔄 Processing command: {message}")
+    def process_received_data(self, message, t_rx_ns=None):
+        """Process the received data and reply to the iPhone"""
+        reply = self.dispatch(message, t_rx_ns)
+        if reply:
+            self.send_to_iphone(reply)
+    
+    def dispatch(self, message, t_rx_ns=None):
+        """Apply one command through the custom processors; returns the reply"""
+        t_rx_ns = t_rx_ns or time.monotonic_ns()
         parts = message.split()
         key = parts[0]
+        if self.estop and key in ("!", "estop"):
+            self.estop.trigger()
+            return "ESTOP_OK"
+        if self.estop and self.estop.engaged and key in ESTOP_BLOCKED:
+            return "ESTOP_ENGAGED"
+        print(f"🔄 Processing command: {message}")
         value = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
 
         if self.pin_control:
@@ -66,36 +111,72 @@ class BT:
             if key == "lamps":
                 print(f"💡 Controlling lamps...")
                 self.lamps_control(20, key)
-                self.send_to_iphone("LAMPS_OK")
+                return "LAMPS_OK"
             elif key == "left":
                 print(f"⬅️  Controlling left with value: {value}")
                 self.left_control(key, value)
-                self.send_to_iphone(f"LEFT_{value}_OK")
+                return f"LEFT_{value}_OK"
             elif key == "right":
                 print(f"➡️  Controlling right with value: {value}")
                 self.right_control(key, value)
-                self.send_to_iphone(f"RIGHT_{value}_OK")
+                return f"RIGHT_{value}_OK"
+            elif key in ("forward", "turn_left", "turn_right") and self.drive_control:
+                print(f"🚗 Drive {key} with value: {value}")
+                self.drive_control(key, value)
+                return f"{key.upper()}_{value}_OK"
+            elif key == "traj" and self.traj_control:
+                reply = self.traj_control(parts[1:])
+                print(f"📈 Trajectory: {reply}")
+                return reply
+            elif key == "macro" and self.macro_control:
+                return self.macro_control(parts[1:])
+            elif key == "state" and self.state_control:
+                return self.state_control(parts[1:])
+            elif key == "release" and self.estop:
+                self.estop.release()
+                return "RELEASE_OK"
             elif key == "status":
                 print("📊 Status request received")
-                self.send_to_iphone("BBB_READY")
+                return "BBB_READY"
             elif key == "ping":
                 print("🏓 Ping received")
-                self.send_to_iphone("PONG")
+                if len(parts) > 2:
+                    # Timestamped ping: board receive/send times for clock sync
+                    return self.clock_sync.ping(parts[1:], t_rx_ns)
+                return "PONG"
+            elif key == "clock":
+                return self.clock_sync.summary()
+            elif key == "at" and self.schedule:
+                # at <t_phone_ms> <command>: apply on the control tick at that time
+                try:
+                    t_apply = self.clock_sync.to_board_s(float(parts[1]))
+                except (ValueError, IndexError) as e:
+                    return f"AT_ERROR {e}"
+                command = " ".join(parts[2:])
+                if not command or parts[2] not in SCHEDULABLE or (
+                        parts[2] == "state" and any(arg.startswith("gpio=") for arg in parts[3:])):
+                    return f"AT_ERROR cannot schedule '{command}'"
+                if not self.schedule(t_apply, lambda: self.dispatch(command)):
+                    return "AT_ERROR not queued"
+                return f"AT_QUEUED {(t_apply - time.monotonic()) * 1000:.1f}"
             elif key == "rssi":
                 print("📶 RSSI request received")
                 # Get current signal strength
                 rssi = self.get_current_rssi()
-                self.send_to_iphone(f"RSSI_{rssi}")
+                return f"RSSI_{rssi}"
             else:
                 print(f"❓ Unknown command: {key}")
-                self.send_to_iphone("UNKNOWN_COMMAND")
+                return "UNKNOWN_COMMAND"
         else:
             print("⚠️  No pin control configured")
-            self.send_to_iphone("ERROR_NO_CONTROL")
+            if self.control_error:
+                return f"ERROR_NO_CONTROL {self.control_error}"
+            return "ERROR_NO_CONTROL"
         
     def get_current_rssi(self):
         """Get current RSSI of connected device"""
         try:
+            import subprocess
             # Method 1: Try using hcitool for active connections
             result = subprocess.run(['hcitool', 'con'], 
                                   capture_output=True, text=True, timeout=5)
@@ -125,6 +206,8 @@ class BT:
     def get_rssi_via_hcitool(self, device_address):
         """Get RSSI using hcitool command"""
         try:
+            import re
+            import subprocess
             result = subprocess.run(['hcitool', 'rssi', device_address], 
                                   capture_output=True, text=True, timeout=3)
             
@@ -195,6 +278,9 @@ class BT:
             return False
 
     def start_server(self):
+        # Imported here so the actuator process never loads dbus/GLib
+        from bluezero import peripheral
+
         try:
             print("Initializing BLE Peripheral...")
             # Create Peripheral
@@ -238,6 +324,16 @@ class BT:
         print(f"Device Name: BBB-PosServer")
         print(f"Adapter Address: EC:75:0C:F7:12:43")
 
+        if self.on_advertising:
+            from bluezero import async_tools
+
+            def advertising_cb():
+                # First main-loop iteration: the service and advertisement are registered
+                self.on_advertising()
+                return False  # one shot
+
+            async_tools.add_timer_ms(1, advertising_cb)
+
         try:
             # Start advertising and publishing GATT service
             self.ble_periph.publish()
@@ -256,6 +352,9 @@ class BT:
         """Clean up resources"""
         try:
             self.stop_rssi_monitoring()
+            if self.command_ring:
+                self.command_ring.unlink()
+                self.command_ring = None
             if self.ble_periph:
                 print("Cleaning up BLE resources...")
             print("Cleanup completed.")
@@ -314,6 +413,7 @@ class BT:
     def debug_bluetooth_status(self):
         """Debug Bluetooth adapter status"""
         try:
+            import subprocess
             print("=== Bluetooth System Status ===")
             
             # Check hciconfig
@@ -0,0 +1,38 @@
+import time
+from ring_lib import RingConsumer
+
+print("Bluetooth Data Receiver Started...")
+print("Waiting for data from iPhone...")
+print("Make sure auto_run.py is running in another terminal!")
+print("Press Ctrl+C to stop")
+print("-" * 50)
+
+consumer = None
+
+try:
+    while consumer is None:
+        try:
+            consumer = RingConsumer()
+        except FileNotFoundError:
+            print("⚠️  No BT server running. Start auto_run.py first!")
+            time.sleep(2)
+
+    while True:
+        # Sleeps on the ring's futex until the BT server publishes a command
+        data = consumer.read()
+
+        print(f"📱 NEW DATA RECEIVED!")
+        print(f"   Message: {data.decode(errors='replace')}")
+        print(f"   Time: {time.strftime('%H:%M:%S')}")
+        if consumer.dropped:
+            print(f"   ⚠️  Dropped so far: {consumer.dropped}")
+        print("-" * 50)
+
+except KeyboardInterrupt:
+    print("\n🛑 Stopped receiving Bluetooth data")
+except Exception as e:
+    print(f"❌ Error: {e}")
+    print("Make sure auto_run.py is running first!")
+finally:
+    if consumer:
+        consumer.close()
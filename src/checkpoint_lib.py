@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Actuator state checkpoint for the BeagleBone Black toy-car
+A small memory-mapped file with two alternating records (A/B), so a crash
+mid-write always leaves the previous record intact; restored on start
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+CHECKPOINT_PATH = "/var/lib/autobbb/checkpoint.bin"
+SLOT_SIZE = 512
+MAGIC = b"ABCK"
+HEADER = struct.Struct("<4sIHI")  # magic, sequence, payload length, crc32(sequence + payload)
+
+# What to do with each output on start: "restore" the saved duty, "zero" it
+# (the saved period is still applied) or "skip" the saved entry entirely
+RESTORE_POLICY = {
+    "P9_14": "restore",  # lamps
+    "P8_13": "zero",     # left motor
+    "P8_19": "zero",     # right motor
+    "P9_12": "zero",     # motor GPIO
+}
+
+class Checkpoint:
+    """Write shadow state in place when it changes, at most once per interval"""
+
+    def __init__(self, path=CHECKPOINT_PATH, min_interval_s=2.0):
+        self.path = path
+        self.min_interval_s = min_interval_s  # bounds eMMC writes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != 2 * SLOT_SIZE:
+                os.ftruncate(fd, 2 * SLOT_SIZE)
+            self.mm = mmap.mmap(fd, 2 * SLOT_SIZE)
+        finally:
+            os.close(fd)
+        self.sequence = 0
+        self.slot = 0  # slot the next write goes to
+        self.last = None  # payload bytes last written
+        self.writes = 0
+        self.skipped = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+
+    def _read_slot(self, slot):
+        base = slot * SLOT_SIZE
+        magic, sequence, length, crc = HEADER.unpack_from(self.mm, base)
+        if magic != MAGIC or length > SLOT_SIZE - HEADER.size:
+            return None
+        payload = bytes(self.mm[base + HEADER.size:base + HEADER.size + length])
+        if zlib.crc32(struct.pack("<I", sequence) + payload) != crc:
+            return None  # torn or never written
+        return sequence, payload
+
+    def load(self):
+        """Newest valid record as a dict, or None; later writes continue after it"""
+        import json
+        records = [(self._read_slot(slot), slot) for slot in (0, 1)]
+        records = [(record, slot) for record, slot in records if record]
+        if not records:
+            return None
+        (sequence, payload), slot = max(records, key=lambda r: r[0][0])
+        self.sequence = sequence
+        self.slot = 1 - slot  # never overwrite the record just loaded
+        self.last = payload
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def write(self, state):
+        """Store a state dict in the older slot; False if unchanged"""
+        import json
+        payload = json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+        if payload == self.last:
+            self.skipped += 1
+            return False
+        if len(payload) > SLOT_SIZE - HEADER.size:
+            raise ValueError(f"checkpoint of {len(payload)} bytes does not fit a slot")
+        self.sequence += 1
+        base = self.slot * SLOT_SIZE
+        # Payload first, header (with the crc over both) last
+        self.mm[base + HEADER.size:base + HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self.mm, base, MAGIC, self.sequence, len(payload),
+                         zlib.crc32(struct.pack("<I", self.sequence) + payload))
+        self.mm.flush()
+        self.slot = 1 - self.slot
+        self.last = payload
+        self.writes += 1
+        return True
+
+    def start(self, snapshot):
+        """Poll snapshot() every interval and write it when it changed; None skips"""
+        def checkpoint_loop():
+            while not self._stop.wait(self.min_interval_s):
+                self._write_snapshot(snapshot)
+
+        self._snapshot = snapshot
+        self._thread = threading.Thread(target=checkpoint_loop, name="checkpoint", daemon=True)
+        self._thread.start()
+
+    def _write_snapshot(self, snapshot):
+        try:
+            state = snapshot()
+            if state is not None:
+                self.write(state)
+        except Exception as e:
+            print(f"⚠️  Checkpoint write failed: {e}")
+
+    def close(self):
+        """Final write of the current state, before shutdown zeroes the outputs"""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._write_snapshot(self._snapshot)
+        self.mm.close()
+
+    def get_stats(self):
+        return {
+            'sequence': self.sequence,
+            'writes': self.writes,
+            'unchanged': self.skipped,
+        }
+
+def main():
+    # python3 checkpoint_lib.py [path]: torn-write check and write cost
+    import tempfile
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), "checkpoint.bin")
+    print(f"💾 Checkpoint self-check on {path}")
+    print("=" * 50)
+
+    checkpoint = Checkpoint(path)
+    state = {'pwm': {'P9_14': {'period_ns': 1000000, 'duty_percent': 40}}, 'gpio': 2}
+    checkpoint.write(state)
+    checkpoint.write(dict(state, gpio=1))
+    # Tear the newest record: the older one must come back
+    newest = (checkpoint.slot + 1) % 2
+    checkpoint.mm[newest * SLOT_SIZE + HEADER.size] ^= 0xFF
+    checkpoint.mm.close()
+    restored = Checkpoint(path).load()
+    print(f"  torn newest record -> restored gpio={restored['gpio']} (expected 2)")
+
+    checkpoint = Checkpoint(path)
+    checkpoint.load()
+    n = 1000
+    start = time.perf_counter()
+    for i in range(n):
+        checkpoint.write(dict(state, gpio=i % 3, seq=i))
+    per_write_us = (time.perf_counter() - start) / n * 1e6
+    checkpoint.mm.close()
+    print(f"  {n} writes: {per_write_us:.1f}us each including msync")
+    print(f"  reload: {Checkpoint(path).load()}")
+    if restored['gpio'] != 2:
+        print("❌ Torn record was not rejected")
+        sys.exit(1)
+    print("✅ A/B records survive a torn write")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Phone/board clock synchronisation for the BeagleBone Black toy-car
+Timestamped pings give a filtered clock offset and RTT per connection, and
+'at' commands are applied on the control tick at a phone-clock time
+
+    ping <seq> <t_phone_ms> [<prev_seq> <t_phone_rx_ms>]
+    -> PONG <seq> <t_board_rx_ms> <t_board_tx_ms>
+The optional pair reports when the phone received the previous PONG, which
+completes that exchange on the board side. Board times are CLOCK_MONOTONIC.
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+
+class ClockSync:
+    """Per-connection clock offset (board - phone) and RTT from ping exchanges"""
+
+    def __init__(self, window=8, alpha=0.25, bucket_ms=5, buckets=40):
+        self.alpha = alpha  # smoothing of the filtered estimates
+        self.bucket_ms = bucket_ms
+        self.samples = deque(maxlen=window)  # (rtt_ms, offset_ms)
+        self.histogram = [0] * buckets  # RTT, last bucket is overflow
+        self.pending = {}  # seq -> (t1, t2, t3) until the phone reports t4
+        self.reset()
+
+    def reset(self):
+        """Forget the estimates, e.g. when the phone (re)connects"""
+        self.samples.clear()
+        self.pending.clear()
+        self.offset_ms = None
+        self.rtt_ms = None
+        self.rtt_min_ms = None
+        self.rtt_max_ms = None
+        self.exchanges = 0
+
+    def ping(self, args, t_rx_ns):
+        """Answer 'ping <seq> <t_phone_ms> [<prev_seq> <t_phone_rx_ms>]'"""
+        try:
+            seq, t_phone = int(args[0]), float(args[1])
+            if len(args) >= 4:
+                self.complete(int(args[2]), float(args[3]))
+        except (ValueError, IndexError):
+            return "PING_ERROR"
+        while len(self.pending) >= 16:
+            del self.pending[next(iter(self.pending))]  # phone never reported these
+        t_board_rx = t_rx_ns / 1e6
+        t_board_tx = time.monotonic_ns() / 1e6
+        self.pending[seq] = (t_phone, t_board_rx, t_board_tx)
+        return f"PONG {seq} {t_board_rx:.3f} {t_board_tx:.3f}"
+
+    def complete(self, seq, t_phone_rx):
+        """Fold in one finished exchange t1..t4 (NTP-style)"""
+        entry = self.pending.pop(seq, None)
+        if entry is None:
+            return
+        t1, t2, t3 = entry
+        rtt = (t_phone_rx - t1) - (t3 - t2)
+        if rtt < 0:
+            return  # phone clock stepped or a bogus report
+        offset = ((t2 - t1) + (t3 - t_phone_rx)) / 2
+        self.samples.append((rtt, offset))
+        self.exchanges += 1
+        self.histogram[min(int(rtt // self.bucket_ms), len(self.histogram) - 1)] += 1
+        self.rtt_min_ms = rtt if self.rtt_min_ms is None else min(self.rtt_min_ms, rtt)
+        self.rtt_max_ms = rtt if self.rtt_max_ms is None else max(self.rtt_max_ms, rtt)
+
+        # The lowest-RTT sample in the window has the least asymmetry error
+        best_rtt, best_offset = min(self.samples)
+        if self.offset_ms is None:
+            self.offset_ms = best_offset
+            self.rtt_ms = rtt
+        else:
+            self.offset_ms += self.alpha * (best_offset - self.offset_ms)
+            self.rtt_ms += self.alpha * (rtt - self.rtt_ms)
+
+    def to_board_s(self, t_phone_ms):
+        """Phone-clock time in ms -> board CLOCK_MONOTONIC seconds"""
+        if self.offset_ms is None:
+            raise ValueError("no clock offset yet")
+        return (t_phone_ms + self.offset_ms) / 1000.0
+
+    def summary(self):
+        """Compact reply for the 'clock' command"""
+        if self.offset_ms is None:
+            return "CLOCK_UNSYNCED"
+        return (f"CLOCK {self.offset_ms:.3f} {self.rtt_ms:.3f} {self.exchanges} "
+                f"{','.join(str(n) for n in self.histogram)}")
+
+    def get_stats(self):
+        return {
+            'offset_ms': self.offset_ms,
+            'rtt_ms': self.rtt_ms,
+            'rtt_min_ms': self.rtt_min_ms,
+            'rtt_max_ms': self.rtt_max_ms,
+            'exchanges': self.exchanges,
+            'histogram': list(self.histogram),
+        }
+
+class CommandQueue:
+    """Scheduler task that runs queued actions at absolute CLOCK_MONOTONIC times"""
+
+    def __init__(self, max_pending=64):
+        self.max_pending = max_pending
+        self.heap = []  # (t_s, seq, action)
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.applied = 0
+        self.rejected = 0
+        self.late_max_s = 0.0
+
+    def at(self, t_s, action):
+        """Queue action() for time t_s; False when the queue is full"""
+        with self.lock:
+            if len(self.heap) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.seq += 1
+            heapq.heappush(self.heap, (t_s, self.seq, action))
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.heap.clear()
+
+    def update(self, dt=None):
+        """Control tick: run every action that is due"""
+        if not self.heap:
+            return
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            with self.lock:
+                t_s, _, action = heapq.heappop(self.heap)
+            action()
+            self.applied += 1
+            late = now - t_s
+            if late > self.late_max_s:
+                self.late_max_s = late
+
+    def get_stats(self):
+        return {
+            'pending': len(self.heap),
+            'applied': self.applied,
+            'rejected': self.rejected,
+            'late_max_ms': self.late_max_s * 1000,
+        }
+
+def main():
+    import random
+
+    print("🕒 Clock sync over a jittery simulated BLE link")
+    print("=" * 50)
+    true_offset_ms = 123456.789  # board - phone
+    sync = ClockSync()
+    prev = None
+    for seq in range(1, 201):
+        # Connection-interval jitter, occasionally a retransmission
+        up_ms = random.uniform(7.5, 30) + (random.random() < 0.05) * 45
+        down_ms = random.uniform(7.5, 30)
+        t_rx_ns = time.monotonic_ns()
+        t1 = t_rx_ns / 1e6 - up_ms - true_offset_ms  # phone clock when it sent
+        args = [str(seq), f"{t1:.3f}"] + ([str(prev[0]), f"{prev[1]:.3f}"] if prev else [])
+        reply = sync.ping(args, t_rx_ns)
+        t_tx = float(reply.split()[3])
+        prev = (seq, t_tx - true_offset_ms + down_ms)
+        if seq in (1, 2, 5, 20, 200):
+            if sync.offset_ms is None:
+                print(f"after {seq:3d} pings: no completed exchange yet")
+            else:
+                print(f"after {seq:3d} pings: offset error={sync.offset_ms - true_offset_ms:+.2f}ms "
+                      f"rtt={sync.rtt_ms:.1f}ms")
+    stats = sync.get_stats()
+    print(f"RTT min/avg/max: {stats['rtt_min_ms']:.1f}/{stats['rtt_ms']:.1f}/"
+          f"{stats['rtt_max_ms']:.1f}ms")
+    for i, count in enumerate(stats['histogram']):
+        if count:
+            print(f"  {i * sync.bucket_ms:3d}-{(i + 1) * sync.bucket_ms:3d}ms {'#' * count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Closed-loop speed control for the BeagleBone Black toy-car
+Fixed-rate deadline scheduler, per-wheel PID loops, duty ramps and a simulated plant
+"""
+
+import threading
+import time
+from rt_lib import enable_realtime
+
+class DeadlineScheduler:
+    """Run registered tasks at a fixed rate against absolute deadlines"""
+
+    def __init__(self, rate_hz=200, name="control", realtime=None):
+        self.name = name
+        self.realtime = realtime  # enable_realtime() kwargs, None = normal CFS thread
+        self.rt_status = None
+        self.rate_hz = rate_hz
+        self.period_s = 1.0 / rate_hz
+        self.tasks = []  # callables taking dt in seconds
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+        self._last_tick = None
+        self.lock = threading.RLock()  # held for the whole tick
+        self.halted = False  # set by the e-stop: ticks do nothing until resume()
+
+        # Loop statistics
+        self.ticks = 0
+        self.overruns = 0
+        self.exec_last_s = 0.0
+        self.exec_max_s = 0.0
+        self.exec_total_s = 0.0
+        self.jitter_max_s = 0.0
+        self.jitter_total_s = 0.0
+
+    def add_task(self, task):
+        """Register a callable run on every tick as task(dt)"""
+        self.tasks.append(task)
+
+    def remove_task(self, task):
+        """Unregister a previously added task"""
+        if task in self.tasks:
+            self.tasks.remove(task)
+
+    def halt(self):
+        """Stop running tasks without taking the tick lock"""
+        self.halted = True
+
+    def resume(self):
+        self.halted = False
+
+    def tick(self, dt=None):
+        """Run every task once and update execution statistics"""
+        if self.halted:
+            return 0.0
+        start = time.monotonic()
+        if dt is None:
+            dt = start - self._last_tick if self._last_tick else self.period_s
+        self._last_tick = start
+
+        with self.lock:
+            for task in self.tasks:
+                try:
+                    task(dt)
+                except Exception as e:
+                    print(f"❌ {self.name} task error: {e}")
+
+        elapsed = time.monotonic() - start
+        self.ticks += 1
+        self.exec_last_s = elapsed
+        self.exec_total_s += elapsed
+        if elapsed > self.exec_max_s:
+            self.exec_max_s = elapsed
+        return elapsed
+
+    def _run_loop(self):
+        """Tick at the configured rate, counting missed deadlines"""
+        if self.realtime is not None:
+            self.rt_status = enable_realtime(**self.realtime)
+
+        next_deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            # Wakeup lateness against the deadline
+            jitter = time.monotonic() - next_deadline
+            if jitter > 0:
+                self.jitter_total_s += jitter
+                if jitter > self.jitter_max_s:
+                    self.jitter_max_s = jitter
+            self.tick()
+
+            next_deadline += self.period_s
+            now = time.monotonic()
+            if now > next_deadline:
+                # Missed one or more deadlines: count them and keep the phase
+                missed = int((now - next_deadline) / self.period_s) + 1
+                self.overruns += missed
+                next_deadline += missed * self.period_s
+
+            self._stop_event.wait(next_deadline - time.monotonic())
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._last_tick = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        print(f"⏱️ {self.name} scheduler started at {self.rate_hz}Hz")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.running = False
+        print(f"⏹️ {self.name} scheduler stopped")
+
+    def get_stats(self):
+        """Get loop execution time and overrun statistics"""
+        return {
+            'rate_hz': self.rate_hz,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'exec_last_us': self.exec_last_s * 1e6,
+            'exec_max_us': self.exec_max_s * 1e6,
+            'exec_avg_us': (self.exec_total_s / self.ticks * 1e6) if self.ticks else 0.0,
+            'jitter_max_us': self.jitter_max_s * 1e6,
+            'jitter_avg_us': (self.jitter_total_s / self.ticks * 1e6) if self.ticks else 0.0,
+            'realtime': bool(self.rt_status and self.rt_status['sched_fifo']),
+        }
+
+    def report(self):
+        """Print loop statistics"""
+        stats = self.get_stats()
+        print(f"=== {self.name} loop stats ===")
+        for key, value in stats.items():
+            print(f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}")
+        print("============================")
+        return stats
+
+class PIDController:
+    """PID with optional feed-forward and integrator clamping"""
+
+    def __init__(self, kp=1.0, ki=0.0, kd=0.0, kf=0.0, out_min=0.0, out_max=100.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.kf = kf  # Feed-forward gain applied to the target
+        self.out_min = out_min
+        self.out_max = out_max
+        self.integral = 0.0
+        self.prev_error = None
+
+    def reset(self):
+        """Clear integrator and derivative history"""
+        self.integral = 0.0
+        self.prev_error = None
+
+    def update(self, target, measured, dt):
+        """Compute the controller output for one step"""
+        error = target - measured
+        derivative = 0.0
+        if self.prev_error is not None and dt > 0:
+            derivative = (error - self.prev_error) / dt
+        self.prev_error = error
+
+        integral = self.integral + error * dt
+        output = self.kf * target + self.kp * error + self.ki * integral + self.kd * derivative
+
+        # Anti-windup: only keep the new integral if the output is not saturated
+        if output > self.out_max:
+            output = self.out_max
+        elif output < self.out_min:
+            output = self.out_min
+        else:
+            self.integral = integral
+        return output
+
+class WheelSpeedLoop:
+    """Speed loop for one wheel: target speed in, PWM duty out
+    (the car has no wheel encoders: only simulate() and main() run it)"""
+
+    def __init__(self, name, write_duty, read_speed, pid=None, resolution=0.5, deadband=None):
+        self.name = name
+        self.write_duty = write_duty  # e.g. PWMController.set_p8_13_duty
+        self.read_speed = read_speed  # returns measured speed in percent of max
+        self.pid = pid or PIDController(kp=0.8, ki=4.0, kf=1.0)
+        self.resolution = resolution  # duty step below which no write happens
+        # How far the PID output must move from the written duty before a new
+        # write: one step by default, so an output settling between two steps
+        # does not toggle between them every tick
+        self.deadband = resolution if deadband is None else deadband
+        self.target_speed = 0.0
+        self.measured_speed = 0.0
+        self.duty = None
+        self.writes = 0
+
+    def set_target_speed(self, speed):
+        """Set target speed in percent of max speed"""
+        self.target_speed = max(0.0, min(100.0, float(speed)))
+        if self.target_speed == 0:
+            self.pid.reset()
+
+    def update(self, dt):
+        """Run one control step; writes PWM only when the duty changes"""
+        self.measured_speed = self.read_speed()
+        duty = self.pid.update(self.target_speed, self.measured_speed, dt)
+        quantized = round(duty / self.resolution) * self.resolution
+        # Zero (a stop) always gets through, whatever the deadband
+        if (self.duty is not None and abs(duty - self.duty) < self.deadband
+                and quantized != 0 and self.target_speed != 0):
+            return
+        duty = quantized
+        if duty != self.duty:
+            self.write_duty(duty)
+            self.duty = duty
+            self.writes += 1
+
+class SimulatedWheel:
+    """First-order DC motor model standing in for a wheel off the board"""
+
+    def __init__(self, gain=1.0, tau_s=0.15, load=0.0, battery=1.0):
+        self.gain = gain  # steady-state speed per percent duty
+        self.tau_s = tau_s  # mechanical time constant
+        self.load = load  # speed lost to friction/load, percent of max
+        self.battery = battery  # 1.0 = fully charged
+        self.duty = 0.0
+        self.speed = 0.0
+
+    def write_duty(self, percent):
+        """PWM side of the plant"""
+        self.duty = percent
+        return True
+
+    def read_speed(self):
+        """Encoder side of the plant"""
+        return self.speed
+
+    def step(self, dt):
+        """Advance the model by dt seconds"""
+        steady = max(0.0, self.gain * self.duty * self.battery - self.load)
+        self.speed += (steady - self.speed) * min(1.0, dt / self.tau_s)
+
+class RampedOutput:
+    """Slew-rate limited duty output interpolated on the control tick"""
+
+    def __init__(self, name, write_duty, accel=200.0, decel=400.0, resolution=0.5):
+        self.name = name
+        self.write_duty = write_duty  # e.g. PWMController.set_p8_13_duty
+        self.accel = accel  # max duty increase, percent per second
+        self.decel = decel  # max duty decrease, percent per second
+        self.resolution = resolution  # duty step below which no write happens
+        self.target = 0.0
+        self.value = 0.0
+        self.written = None
+        self.writes = 0
+
+    def set_target(self, percent):
+        """Set the endpoint the output ramps towards"""
+        self.target = max(0.0, min(100.0, float(percent or 0)))
+
+    def control(self, side, duty):
+        """BT dispatcher hook: `left N`/`right N` set a ramp endpoint"""
+        self.set_target(duty)
+
+    def set_limits(self, accel=None, decel=None):
+        """Change the acceleration/deceleration limits in percent per second"""
+        if accel is not None:
+            self.accel = accel
+        if decel is not None:
+            self.decel = decel
+
+    def jump(self, percent):
+        """Bypass the ramp and write a value immediately"""
+        self.set_target(percent)
+        self.value = self.target
+        self._write()
+
+    def hold(self, percent):
+        """Continue from a duty already on the output (hot restart) without writing it"""
+        self.set_target(percent)
+        self.value = self.target
+        self.written = round(self.value / self.resolution) * self.resolution
+
+    def update(self, dt):
+        """Move one tick towards the target; writes PWM only when the duty changes"""
+        delta = self.target - self.value
+        if delta > 0:
+            self.value = min(self.target, self.value + self.accel * dt)
+        elif delta < 0:
+            self.value = max(self.target, self.value - self.decel * dt)
+        self._write()
+
+    def _write(self):
+        duty = round(self.value / self.resolution) * self.resolution
+        if duty != self.written:
+            self.write_duty(duty)
+            self.written = duty
+            self.writes += 1
+
+class SpeedController:
+    """Left/right wheel speed loops running on a shared deadline scheduler"""
+
+    def __init__(self, left_loop, right_loop, scheduler=None, rate_hz=200):
+        self.scheduler = scheduler or DeadlineScheduler(rate_hz, name="speed")
+        self.left = left_loop
+        self.right = right_loop
+        self.scheduler.add_task(self.left.update)
+        self.scheduler.add_task(self.right.update)
+
+    def set_target_speeds(self, left, right):
+        """Set both wheel target speeds"""
+        self.left.set_target_speed(left)
+        self.right.set_target_speed(right)
+
+    def left_control(self, side, speed):
+        """BT dispatcher hook: `left N` sets a target speed"""
+        self.left.set_target_speed(speed or 0)
+
+    def right_control(self, side, speed):
+        """BT dispatcher hook: `right N` sets a target speed"""
+        self.right.set_target_speed(speed or 0)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+        self.left.write_duty(0)
+        self.right.write_duty(0)
+
+    def get_stats(self):
+        stats = self.scheduler.get_stats()
+        stats['left_writes'] = self.left.writes
+        stats['right_writes'] = self.right.writes
+        return stats
+
+def simulate(duration=3.0, rate_hz=200, target=60, battery=0.8, load=5.0, pid=None):
+    """Run the speed loop against the simulated plant without sleeping"""
+    plant = SimulatedWheel(battery=battery, load=load)
+    loop = WheelSpeedLoop("sim", plant.write_duty, plant.read_speed, pid=pid)
+    scheduler = DeadlineScheduler(rate_hz, name="sim")
+    scheduler.add_task(plant.step)
+    scheduler.add_task(loop.update)
+
+    loop.set_target_speed(target)
+    dt = 1.0 / rate_hz
+    settle_time = None
+    for i in range(int(duration * rate_hz)):
+        scheduler.tick(dt)
+        if settle_time is None and abs(plant.speed - target) < 0.02 * target:
+            settle_time = (i + 1) * dt
+
+    return {
+        'final_speed': plant.speed,
+        'final_duty': loop.duty,
+        'settle_time_s': settle_time,
+        'writes': loop.writes,
+        'exec_avg_us': scheduler.get_stats()['exec_avg_us'],
+        'exec_max_us': scheduler.get_stats()['exec_max_us'],
+    }
+
+def main():
+    print("🚗 Speed Loop Tuning (simulated plant)")
+    print("======================================")
+    for battery, load in ((1.0, 0.0), (0.8, 5.0), (0.6, 10.0)):
+        result = simulate(battery=battery, load=load)
+        settle = result['settle_time_s']
+        print(f"battery={battery:.1f} load={load:4.1f} -> "
+              f"speed={result['final_speed']:.1f}% duty={result['final_duty']:.1f}% "
+              f"settle={'%.3fs' % settle if settle else 'never'} writes={result['writes']} "
+              f"exec avg={result['exec_avg_us']:.1f}us max={result['exec_max_us']:.1f}us")
+
+    # Real-time run to measure scheduling overruns on this machine
+    plant_left, plant_right = SimulatedWheel(), SimulatedWheel(battery=0.7)
+    scheduler = DeadlineScheduler(200, name="speed")
+    scheduler.add_task(plant_left.step)
+    scheduler.add_task(plant_right.step)
+    controller = SpeedController(
+        WheelSpeedLoop("left", plant_left.write_duty, plant_left.read_speed),
+        WheelSpeedLoop("right", plant_right.write_duty, plant_right.read_speed),
+        scheduler=scheduler,
+    )
+    controller.set_target_speeds(50, 50)
+    controller.start()
+    time.sleep(2)
+    controller.stop()
+    controller.scheduler.report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Differential-drive mixer for the BeagleBone Black toy-car
+Turns throttle/steering into one coordinated left+right duty update
+"""
+
+import threading
+import time
+
+class DriveMixer:
+    """Mix throttle and steering into a back-to-back left/right write pair"""
+
+    def __init__(self, write_left, write_right, lock=None):
+        self.write_left = write_left  # e.g. RampedOutput.set_target or PWMController.set_p8_13_duty
+        self.write_right = write_right
+        self.lock = lock or threading.Lock()  # pass DeadlineScheduler.lock to land in one tick
+        self.throttle = 0.0  # 0..100 percent
+        self.steering = 0.0  # -100 (full left) .. 100 (full right)
+        self.left_duty = 0.0
+        self.right_duty = 0.0
+
+        # Skew between the left and right write, in nanoseconds
+        self.updates = 0
+        self.skew_last_ns = 0
+        self.skew_max_ns = 0
+        self.skew_total_ns = 0
+
+    @staticmethod
+    def mix(throttle, steering):
+        """Compute (left, right) duties; keeps the wheel difference when saturating"""
+        left = throttle + steering / 2.0
+        right = throttle - steering / 2.0
+
+        # Shift both wheels down so the faster one fits, preserving the turn
+        overflow = max(left, right) - 100.0
+        if overflow > 0:
+            left -= overflow
+            right -= overflow
+        return max(0.0, min(100.0, left)), max(0.0, min(100.0, right))
+
+    def apply(self, throttle=None, steering=None):
+        """Compute both wheel duties and write them as one pair"""
+        if throttle is not None:
+            self.throttle = max(0.0, min(100.0, float(throttle)))
+        if steering is not None:
+            self.steering = max(-100.0, min(100.0, float(steering)))
+        left, right = self.mix(self.throttle, self.steering)
+
+        with self.lock:
+            self.write_left(left)
+            t_left = time.perf_counter_ns()
+            self.write_right(right)
+            t_right = time.perf_counter_ns()
+
+        skew = t_right - t_left
+        self.left_duty = left
+        self.right_duty = right
+        self.updates += 1
+        self.skew_last_ns = skew
+        self.skew_total_ns += skew
+        if skew > self.skew_max_ns:
+            self.skew_max_ns = skew
+        return left, right
+
+    def control(self, key, value):
+        """BT dispatcher hook for `forward N`, `turn_left N` and `turn_right N`"""
+        value = value or 0
+        if key == "forward":
+            return self.apply(throttle=value)
+        elif key == "turn_left":
+            return self.apply(steering=-value)
+        elif key == "turn_right":
+            return self.apply(steering=value)
+        return None
+
+    def get_stats(self):
+        """Get write-pair skew statistics"""
+        return {
+            'updates': self.updates,
+            'left_duty': self.left_duty,
+            'right_duty': self.right_duty,
+            'skew_last_us': self.skew_last_ns / 1000,
+            'skew_max_us': self.skew_max_ns / 1000,
+            'skew_avg_us': (self.skew_total_ns / self.updates / 1000) if self.updates else 0.0,
+        }
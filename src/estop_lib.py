@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Emergency stop for the BeagleBone Black toy-car
+One preallocated routine, reachable from the RX opcode, a GPIO input and
+SIGTERM, that zeroes every PWM output and motor GPIO line in bounded time
+"""
+
+import os
+import signal
+import threading
+import time
+
+ESTOP_OPCODE = b"!"  # single-byte RX write, checked before anything else
+ZERO = b"0"
+ESTOP_BUDGET_US = 5000  # worst case allowed: one 200Hz control tick
+
+class EmergencyStop:
+    """Zero every registered output without queues, logging or shared locks"""
+
+    def __init__(self):
+        self.pins = ()  # PWMPin objects with an open duty_fd
+        self.waveform_pins = ()  # backends without a duty fd zero through pin.zero()
+        self.lines = ()  # periphery GPIO motor lines, driven low
+        self.latches = ()  # callables that stop loops from re-driving outputs
+        self.resumes = ()  # callables undoing the latches on release()
+        self.engaged = False
+        self.triggers = 0
+        self.latency_last_ns = 0
+        self.latency_max_ns = 0
+        self._watch_thread = None
+
+    def add_pwm(self, *pins):
+        self.pins = self.pins + tuple(pins)
+        self.waveform_pins = self.waveform_pins + tuple(pin for pin in pins if hasattr(pin, 'zero'))
+
+    def add_line(self, *lines):
+        self.lines = self.lines + tuple(lines)
+
+    def add_latch(self, latch, resume=None):
+        self.latches = self.latches + (latch,)
+        if resume is not None:
+            self.resumes = self.resumes + (resume,)
+
+    def trigger(self):
+        """Fast path: lock out, zero every output, latch, zero again"""
+        start = time.perf_counter_ns()
+        self.engaged = True
+        for pin in self.pins:
+            pin.lockout = True
+            pin.duty_percent = 0
+        for pin in self.pins:
+            fd = pin.duty_fd
+            if fd is not None:
+                try:
+                    os.pwrite(fd, ZERO, 0)
+                except OSError:
+                    pass
+        for pin in self.waveform_pins:
+            try:
+                pin.zero()
+            except OSError:
+                pass
+        for line in self.lines:
+            try:
+                line.write(False)
+            except Exception:
+                pass
+        for latch in self.latches:
+            latch()
+        # A control tick that passed its lockout check before we started may
+        # have landed one write after ours: zero once more
+        for pin in self.pins:
+            fd = pin.duty_fd
+            if fd is not None:
+                try:
+                    os.pwrite(fd, ZERO, 0)
+                except OSError:
+                    pass
+        for pin in self.waveform_pins:
+            try:
+                pin.zero()
+            except OSError:
+                pass
+
+        elapsed = time.perf_counter_ns() - start
+        self.triggers += 1
+        self.latency_last_ns = elapsed
+        if elapsed > self.latency_max_ns:
+            self.latency_max_ns = elapsed
+
+    def release(self):
+        """Re-arm normal control after an e-stop"""
+        for pin in self.pins:
+            pin.lockout = False
+        for resume in self.resumes:
+            resume()
+        self.engaged = False
+        print("✅ E-stop released")
+
+    def install_signal(self, sig=signal.SIGTERM, then=None):
+        """Route a signal to the e-stop; then(sig, frame) runs afterwards"""
+        def handler(signum, frame):
+            self.trigger()
+            if then:
+                then(signum, frame)
+        signal.signal(sig, handler)
+
+    def watch_gpio(self, chip_path, line, edge="falling"):
+        """Trigger from a GPIO input (e.g. a physical stop button)"""
+        from periphery import GPIO
+        button = GPIO(chip_path, line, "in")
+        button.edge = edge
+
+        def watch_loop():
+            while True:
+                if button.poll(None):
+                    button.read_event()
+                    self.trigger()
+
+        self._watch_thread = threading.Thread(target=watch_loop, daemon=True)
+        self._watch_thread.start()
+        print(f"🛑 E-stop input armed on {chip_path} line {line}")
+
+    def get_stats(self):
+        return {
+            'engaged': self.engaged,
+            'triggers': self.triggers,
+            'latency_last_us': self.latency_last_ns / 1000,
+            'latency_max_us': self.latency_max_ns / 1000,
+        }
+
+class _BenchPin:
+    """Stand-in PWMPin backed by a temp file"""
+
+    def __init__(self, path):
+        self.duty_fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        self.lockout = False
+
+def main():
+    import sys
+    import tempfile
+
+    print("🛑 E-stop worst-case latency under load")
+    print("========================================")
+
+    tmp = tempfile.mkdtemp()
+    estop = EmergencyStop()
+    estop.add_pwm(*[_BenchPin(os.path.join(tmp, f"duty{i}")) for i in range(3)])
+
+    # Busy lanes: a CPU-bound thread plus one holding a lock the e-stop must not need
+    sys.setswitchinterval(0.001)
+    budget_us = float(sys.argv[1]) if len(sys.argv) > 1 else ESTOP_BUDGET_US
+    busy_lock = threading.Lock()
+    stop = threading.Event()
+
+    def spin():
+        x = 0
+        while not stop.is_set():
+            x += 1
+
+    def hog():
+        while not stop.is_set():
+            with busy_lock:
+                time.sleep(0.01)
+
+    workers = [threading.Thread(target=spin, daemon=True)]
+    workers.append(threading.Thread(target=hog, daemon=True))
+    for w in workers:
+        w.start()
+
+    for _ in range(500):
+        estop.trigger()
+        estop.engaged = False
+        time.sleep(0.001)
+    stop.set()
+
+    stats = estop.get_stats()
+    print(f"triggers={stats['triggers']} last={stats['latency_last_us']:.1f}us "
+          f"worst={stats['latency_max_us']:.1f}us budget={budget_us:.0f}us")
+    if stats['latency_max_us'] > budget_us:
+        print("❌ Worst-case e-stop latency over budget")
+        sys.exit(1)
+    print("✅ Within budget")
+
+if __name__ == "__main__":
+    main()
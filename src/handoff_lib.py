@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Hot restart for the BeagleBone Black toy-car
+The running process hands its open PWM duty_cycle and GPIO line descriptors
+(SCM_RIGHTS) and its shadow state to a successor over a Unix socket, so the
+outputs keep their values while the code is swapped
+
+    python3 actuator_run.py --hot              # listens for a successor
+    python3 actuator_run.py --hot --takeover   # adopts from it, old one exits
+"""
+
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+
+HANDOFF_PATH = "/run/autobbb/handoff.sock"
+MAX_STATE = 64 * 1024
+MAX_FDS = 16
+
+# periphery drives lines through the GPIO chardev v1 handle ABI:
+# _IOWR(0xB4, 0x08/0x09, struct gpiohandle_data { __u8 values[64]; })
+GPIOHANDLE_GET_LINE_VALUES_IOCTL = 0xC040B408
+GPIOHANDLE_SET_LINE_VALUES_IOCTL = 0xC040B409
+
+class InheritedLine:
+    """Output line driven through a line handle fd received from the old process"""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def write(self, value):
+        fcntl.ioctl(self.fd, GPIOHANDLE_SET_LINE_VALUES_IOCTL, bytes([1 if value else 0]) + bytes(63))
+
+    def read(self):
+        data = bytearray(64)
+        fcntl.ioctl(self.fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
+        return bool(data[0])
+
+    def close(self):
+        os.close(self.fd)
+
+def snapshot(actuators):
+    """Shadow state plus the descriptors behind it: (state, fds)"""
+    fds = []
+    state = {'pwm': [], 'gpio': None, 'sources': {}, 'ramps': {},
+             'estop_engaged': actuators['estop'].engaged}
+    for pin in actuators['pwm'].pins:
+        # sysfs pins hand over their duty_cycle fd, chardev pins the chip fd
+        # that holds the channel requested; other backends have none and the
+        # successor starts them again at the same waveform
+        fd = pin.duty_fd if pin.duty_fd is not None else getattr(pin, 'chip_fd', None)
+        if pin.is_active:
+            state['pwm'].append({'name': pin.name, 'fd': None if fd is None else len(fds),
+                                 'backend': pin.backend, 'period_ns': pin.period_ns,
+                                 'duty_percent': pin.duty_percent})
+            if fd is not None:
+                fds.append(fd)
+    line_fd = getattr(actuators['pin'].P9_12, 'fd', None)
+    if line_fd is not None:
+        state['gpio'] = {'fd': len(fds), 'mode': actuators['pin'].p9_12_mode}
+        fds.append(line_fd)
+    for side in ("left", "right"):
+        arbiter = actuators[f'{side}_arbiter']
+        # Sources that never go stale would not resend on their own
+        state['sources'][side] = {name: src.value for name, src in arbiter.sources.items()
+                                  if src.stamp is not None and src.timeout_s is None}
+        state['ramps'][side] = actuators[f'{side}_ramp'].value
+    return state, fds
+
+class HandoffServer:
+    """Old process: wait for a successor, hand over the outputs, then exit"""
+
+    def __init__(self, actuators, path=HANDOFF_PATH, before_exit=None):
+        self.actuators = actuators
+        self.path = path
+        self.before_exit = before_exit  # e.g. print stats; must not touch the outputs
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(1)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._serve, name="handoff", daemon=True)
+        self.thread.start()
+        print(f"🔁 Hot restart: successors can take over via {self.path}")
+
+    def _serve(self):
+        while True:
+            conn, _ = self.sock.accept()
+            with conn:
+                self._hand_over(conn)
+
+    def _hand_over(self, conn):
+        control = self.actuators['control']
+        # Halted, the tick stops writing; the outputs simply keep their values
+        with control.lock:
+            control.halt()
+            t_stop_ns = time.monotonic_ns()
+            state, fds = snapshot(self.actuators)
+            # Late commands must not change what was just captured
+            for pin in self.actuators['pwm'].pins:
+                pin.lockout = True
+            self.actuators['pin'].motor_stop_event.set()
+        state['t_stop_ns'] = t_stop_ns
+        try:
+            socket.send_fds(conn, [json.dumps(state).encode()], fds)
+            conn.settimeout(10.0)
+            ack = conn.recv(16)
+        except OSError as e:
+            ack = b""
+            print(f"❌ Hot restart: handoff failed: {e}")
+        if ack != b"OK":
+            # Successor gave up: carry on as before
+            print("⚠️  Hot restart: successor did not take over, resuming")
+            if not self.actuators['estop'].engaged:
+                for pin in self.actuators['pwm'].pins:
+                    pin.lockout = False
+                control.resume()
+            if state['gpio'] and state['gpio']['mode'] == 2:
+                self.actuators['pin'].set_pin_9_12(2)
+            return
+        print(f"🔁 Hot restart: outputs handed over after "
+              f"{(time.monotonic_ns() - t_stop_ns) / 1e6:.1f}ms, exiting")
+        if self.before_exit:
+            self.before_exit()
+        # No cleanup: PWM/GPIO teardown would glitch outputs the successor now owns
+        os._exit(0)
+
+class Takeover:
+    """New process: descriptors and shadow state received from the old one"""
+
+    def __init__(self, path=HANDOFF_PATH, timeout=5.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        message, self.fds, _, _ = socket.recv_fds(self.sock, MAX_STATE, MAX_FDS)
+        self.state = json.loads(message)
+        self.t_stop_ns = self.state['t_stop_ns']
+        self.ready_ns = None
+        print(f"🔁 Hot restart: received {len(self.fds)} descriptors and shadow state")
+
+    def fd(self, index):
+        return self.fds[index]
+
+    def complete(self):
+        """Tell the old process it may exit; returns the gap so far in ms"""
+        self.sock.sendall(b"OK")
+        self.sock.close()
+        self.ready_ns = time.monotonic_ns()
+        return self.gap_ms()
+
+    def gap_ms(self, until_ns=None):
+        """Time from the old process's last command to until_ns (default now)"""
+        return ((until_ns or time.monotonic_ns()) - self.t_stop_ns) / 1e6
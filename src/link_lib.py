@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Low-latency command channel between the BLE front-end and the actuator process
+Unix datagram sockets carrying sequenced, timestamped command frames
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+
+from estop_lib import ESTOP_OPCODE
+
+FRONTEND_PATH = "/run/autobbb/frontend.sock"
+ACTUATOR_PATH = "/run/autobbb/actuator.sock"
+ESTOP_PATH = "/run/autobbb/estop.sock"  # e-stop only: never queued behind commands
+
+# Frame header: sequence, origin timestamp (CLOCK_MONOTONIC ns, shared by both
+# processes), frame kind
+FRAME = struct.Struct("=IQB")
+KIND_COMMAND = 0  # payload is a command or its reply
+KIND_DISCONNECT = 1  # front-end -> actuator: the phone's BLE connection dropped
+MAX_FRAME = 512
+
+class LatencyStats:
+    """Running min/avg/max of nanosecond latencies"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def record(self, latency_ns):
+        self.count += 1
+        self.total_ns += latency_ns
+        if self.min_ns is None or latency_ns < self.min_ns:
+            self.min_ns = latency_ns
+        if latency_ns > self.max_ns:
+            self.max_ns = latency_ns
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'min_us': (self.min_ns or 0) / 1000,
+            'avg_us': (self.total_ns / self.count / 1000) if self.count else 0.0,
+            'max_us': self.max_ns / 1000,
+        }
+
+class CommandLink:
+    """One end of the datagram channel; both processes use the same class"""
+
+    def __init__(self, local_path, peer_path):
+        self.local_path = local_path
+        self.peer_path = peer_path
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        if os.path.exists(local_path):
+            os.unlink(local_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(local_path)
+        self.seq = 0
+        self.send_errors = 0
+        self.latency = LatencyStats()  # origin -> handled on this side
+
+    def send(self, message, t_origin_ns=None, seq=None, kind=KIND_COMMAND):
+        """Send one frame to the peer; never blocks"""
+        if seq is None:
+            seq = self.seq = (self.seq + 1) & 0xffffffff
+        if t_origin_ns is None:
+            t_origin_ns = time.monotonic_ns()
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        try:
+            self.sock.sendto(FRAME.pack(seq, t_origin_ns, kind) + message,
+                             socket.MSG_DONTWAIT, self.peer_path)
+            return seq
+        except OSError:
+            # Peer not running or its queue is full: drop rather than stall
+            self.send_errors += 1
+            return None
+
+    def recv(self, timeout=None):
+        """Return (seq, t_origin_ns, kind, message) or None on timeout"""
+        self.sock.settimeout(timeout)
+        try:
+            frame = self.sock.recv(MAX_FRAME)
+        except socket.timeout:
+            return None
+        seq, t_origin_ns, kind = FRAME.unpack_from(frame)
+        return seq, t_origin_ns, kind, frame[FRAME.size:].decode('utf-8', errors='replace')
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.local_path):
+            os.unlink(self.local_path)
+
+class FrontendLink(CommandLink):
+    """BLE side: forwards raw commands and relays the actuator's replies"""
+
+    def __init__(self, on_reply, local_path=FRONTEND_PATH, peer_path=ACTUATOR_PATH):
+        super().__init__(local_path, peer_path)
+        self.on_reply = on_reply  # e.g. BT.send_to_iphone
+        self.running = True
+        self.thread = threading.Thread(target=self._reply_loop, daemon=True)
+        self.thread.start()
+
+    def forward(self, message, t_rx_ns=None):
+        """Forward one command stamped with its BLE receive time"""
+        return self.send(message, t_origin_ns=t_rx_ns)
+
+    def disconnected(self):
+        """Tell the actuator process the phone is gone (BT.on_disconnect)"""
+        return self.send(b"", kind=KIND_DISCONNECT)
+
+    def _reply_loop(self):
+        while self.running:
+            try:
+                frame = self.recv(timeout=0.5)
+            except OSError:
+                break
+            if frame is None:
+                continue
+            seq, t_origin_ns, _, reply = frame
+            # Round trip: BLE receive -> actuator applied -> reply back here
+            self.latency.record(time.monotonic_ns() - t_origin_ns)
+            self.on_reply(reply)
+
+    def close(self):
+        self.running = False
+        super().close()
+
+class ActuatorLink(CommandLink):
+    """Actuator side: applies commands through a dispatcher and replies"""
+
+    def __init__(self, dispatch, on_disconnect=None, local_path=ACTUATOR_PATH, peer_path=FRONTEND_PATH):
+        super().__init__(local_path, peer_path)
+        self.dispatch = dispatch  # (message, t_rx_ns) -> reply string
+        self.on_disconnect = on_disconnect  # the BLE drop, as seen by the front-end
+        self.dispatch_errors = 0
+        self.running = False
+
+    def serve(self):
+        """Handle commands until close(); blocks"""
+        self.running = True
+        while self.running:
+            try:
+                frame = self.recv(timeout=0.5)
+            except OSError:
+                break
+            if frame is None:
+                continue
+            seq, t_origin_ns, kind, message = frame
+            try:
+                if kind == KIND_DISCONNECT:
+                    if self.on_disconnect:
+                        self.on_disconnect()
+                    continue
+                reply = self.dispatch(message, t_origin_ns)
+            except Exception as e:
+                # One bad frame (e.g. an empty write) must not end the loop
+                self.dispatch_errors += 1
+                print(f"❌ Error handling {message!r}: {e}")
+                continue
+            # End to end: BLE receive in the front-end -> outputs written here
+            self.latency.record(time.monotonic_ns() - t_origin_ns)
+            if reply:
+                self.send(reply, t_origin_ns=t_origin_ns, seq=seq)
+
+    def close(self):
+        self.running = False
+        super().close()
+
+class RemoteEstop:
+    """Front-end stand-in for EmergencyStop (BT.estop in split mode): one
+    datagram on the actuator's dedicated e-stop socket"""
+
+    def __init__(self, path=ESTOP_PATH):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.triggers = 0
+        self.send_errors = 0
+
+    def trigger(self):
+        self.triggers += 1
+        try:
+            self.sock.sendto(ESTOP_OPCODE, socket.MSG_DONTWAIT, self.path)
+        except OSError:
+            self.send_errors += 1
+
+    def close(self):
+        self.sock.close()
+
+class EstopListener:
+    """Actuator side: a thread of its own blocked on the e-stop socket, so a
+    trigger never waits for the command frames queued on the link"""
+
+    def __init__(self, trigger, path=ESTOP_PATH):
+        self.trigger = trigger  # EmergencyStop.trigger
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+        self.running = False
+        self.thread = None
+
+    def _listen(self):
+        while self.running:
+            try:
+                self.sock.recv(16)
+            except OSError:
+                break
+            self.trigger()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._listen, name="estop-link", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
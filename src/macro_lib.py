@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Named macros for the BeagleBone Black toy-car
+Light and motion sequences loaded from macros.json, compiled once into
+timelines and started with a single 'macro <id>' command
+
+macros.json:
+    {"lamps": {"outputs": ["lamps"], "repeat": 1, "end": [0], "steps": [
+        {"set": [100], "hold_ms": 200},
+        {"fade": [0], "ms": 3000, "step_ms": 100},
+        {"wave": {"offset": 50, "amplitude": 45, "period_ms": 3000, "phase_deg": [0]},
+         "ms": 6000, "step_ms": 100}]}}
+"""
+
+import math
+import os
+import threading
+import time
+
+from timeline_lib import Timeline
+
+MACRO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macros.json")
+
+def compile_macro(name, spec, outputs):
+    """Turn one macro spec into a Timeline; outputs maps output names to writer indices"""
+    names = spec['outputs']
+    channels = len(names)
+    indices = []
+    for output in names:
+        if output not in outputs:
+            raise ValueError(f"{name}: unknown output '{output}'")
+        indices.append(outputs[output])
+
+    def row_of(values):
+        if len(values) != channels:
+            raise ValueError(f"{name}: expected {channels} values, got {len(values)}")
+        return [float(v) for v in values]
+
+    cycle = []
+    t = 0.0
+    current = [0.0] * channels
+    for step in spec['steps']:
+        if 'set' in step:
+            current = row_of(step['set'])
+            cycle.append((t, current))
+            t += step.get('hold_ms', 0)
+        elif 'fade' in step:
+            target = row_of(step['fade'])
+            ms = step['ms']
+            count = max(1, int(ms // step.get('step_ms', 20)))
+            start = current
+            for i in range(1, count + 1):
+                current = [a + (b - a) * i / count for a, b in zip(start, target)]
+                cycle.append((t + ms * i / count, current))
+            t += ms
+        elif 'wave' in step:
+            wave = step['wave']
+            ms = step['ms']
+            step_ms = step.get('step_ms', 20)
+            phases = [math.radians(p) for p in wave.get('phase_deg', [0] * channels)]
+            if len(phases) != channels:
+                raise ValueError(f"{name}: expected {channels} phases, got {len(phases)}")
+            for i in range(int(ms // step_ms)):
+                angle = 2 * math.pi * i * step_ms / wave['period_ms']
+                current = [min(100.0, max(0.0, wave['offset'] + wave['amplitude'] * math.sin(angle + p)))
+                           for p in phases]
+                cycle.append((t + i * step_ms, current))
+            t += ms
+        else:
+            raise ValueError(f"{name}: unknown step {sorted(step)}")
+
+    repeat = int(spec.get('repeat', 1))
+    points = []
+    for n in range(repeat):
+        points.extend((n * t + t_ms, row) for t_ms, row in cycle)
+    # Closing point, after the last hold has played out: optional 'end' values
+    if 'end' in spec:
+        current = row_of(spec['end'])
+    points.append((repeat * t, current))
+    return Timeline.from_points(points, channels, name=name, outputs=indices)
+
+class MacroStore:
+    """Compiled macros, swapped as a whole when the config file changes"""
+
+    def __init__(self, player, outputs, path=MACRO_PATH):
+        self.player = player  # TimelinePlayer on the control tick
+        self.outputs = outputs  # e.g. {"lamps": 2}; names outside it fail to compile
+        self.path = path
+        self.macros = {}
+        self.mtime = None
+        self.loads = 0
+        self.load_errors = 0
+        self._watch_thread = None
+
+    def reload(self, force=False):
+        """Recompile the config file if it changed; keeps the old set on errors"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print(f"⚠️  Macros unavailable: {e}")
+            return False
+        if not force and mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        import json  # deferred until the file has actually changed
+        try:
+            with open(self.path) as f:
+                config = json.load(f)
+            start = time.perf_counter()
+            compiled = {name: compile_macro(name, spec, self.outputs)
+                        for name, spec in config.items()}
+        except Exception as e:
+            self.load_errors += 1
+            print(f"❌ Macro reload failed, keeping {len(self.macros)} macros: {e}")
+            return False
+        self.macros = compiled  # single reference swap: play() never sees a half-built set
+        self.loads += 1
+        print(f"🎬 Loaded {len(compiled)} macros in {(time.perf_counter() - start) * 1000:.1f}ms: "
+              f"{', '.join(sorted(compiled))}")
+        return True
+
+    def start_watching(self, interval=1.0):
+        """Poll the config file's mtime and hot-reload on change"""
+        def watch_loop():
+            while True:
+                time.sleep(interval)
+                self.reload()
+
+        self._watch_thread = threading.Thread(target=watch_loop, daemon=True)
+        self._watch_thread.start()
+
+    def play(self, name):
+        """Start a compiled macro; False if there is no such macro"""
+        timeline = self.macros.get(name)
+        if timeline is None:
+            return False
+        self.player.play(timeline)
+        return True
+
+    def handle(self, args):
+        """BT dispatcher hook for 'macro ...'; returns the reply"""
+        if not args:
+            return "MACRO_ERROR missing id"
+        name = args[0]
+        if name == "stop":
+            self.player.stop(reason=None)
+            return "MACRO_STOPPED"
+        elif name == "list":
+            return f"MACROS {','.join(sorted(self.macros))}"
+        elif name == "reload":
+            if self.reload(force=True):
+                return f"MACRO_RELOADED {len(self.macros)}"
+            return "MACRO_ERROR reload failed"
+        elif self.play(name):
+            return f"MACRO_STARTED {name}"
+        return f"MACRO_UNKNOWN {name}"
+
+    def get_stats(self):
+        return {
+            'macros': len(self.macros),
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+        }
+
+def main():
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else MACRO_PATH
+    print(f"🎬 Compiling {path}")
+    print("=" * 50)
+    from timeline_lib import TimelinePlayer
+    store = MacroStore(TimelinePlayer([print, print, print]), {"left": 0, "right": 1, "lamps": 2}, path)
+    if not store.reload():
+        sys.exit(1)
+    for name, timeline in sorted(store.macros.items()):
+        print(f"  {name:10s} {timeline.count:4d} points  {timeline.duration_ms:6d}ms  "
+              f"outputs={timeline.outputs}")
+
+if __name__ == "__main__":
+    main()
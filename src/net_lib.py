@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Local UDP / Unix-socket control channel for the BeagleBone Black toy-car
+Feeds the same command dispatcher as BLE, for high-rate joystick streams
+over USB gadget Ethernet or Wi-Fi
+
+Packet format: "<seq> <command>", e.g. "1042 forward 60"
+Replies are sent back as "<seq> <reply>"
+"""
+
+import os
+import selectors
+import socket
+import threading
+import time
+
+DEFAULT_PORT = 5005
+SEQ_MOD = 1 << 32
+
+class NetServer:
+    """Non-blocking datagram listener in front of BT.dispatch"""
+
+    def __init__(self, dispatch, host="0.0.0.0", port=DEFAULT_PORT, unix_path=None, reply=True):
+        self.dispatch = dispatch  # message -> reply string
+        self.reply = reply
+        self.selector = selectors.DefaultSelector()
+        self.sockets = []
+        self.last_seq = {}  # peer address -> last accepted sequence
+        self.running = False
+        self.thread = None
+
+        # Counters
+        self.received = 0
+        self.handled = 0
+        self.dropped = 0  # out-of-order or duplicate
+        self.malformed = 0
+        self.dispatch_errors = 0
+
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        udp.bind((host, port))
+        self._add_socket(udp)
+        self.port = udp.getsockname()[1]
+
+        self.unix_path = unix_path
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            unix = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            unix.bind(unix_path)
+            self._add_socket(unix)
+
+    def _add_socket(self, sock):
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ)
+        self.sockets.append(sock)
+
+    def _accept_seq(self, peer, seq):
+        """Accept only sequences newer than the last one from this peer; 0 restarts"""
+        last = self.last_seq.get(peer)
+        if last is not None and seq != 0:
+            diff = (seq - last) % SEQ_MOD
+            if diff == 0 or diff >= SEQ_MOD // 2:
+                return False
+        self.last_seq[peer] = seq
+        return True
+
+    def _handle(self, sock, data, peer):
+        self.received += 1
+        try:
+            seq_text, message = data.decode('utf-8').split(None, 1)
+            seq = int(seq_text) % SEQ_MOD
+        except ValueError:
+            self.malformed += 1
+            return
+        if not self._accept_seq(peer, seq):
+            self.dropped += 1
+            return
+
+        try:
+            reply = self.dispatch(message.strip())
+        except Exception as e:
+            # A bad command must not take the selector thread down with it
+            self.dispatch_errors += 1
+            print(f"❌ Error handling {message.strip()!r}: {e}")
+            reply = f"ERROR {e}"
+        else:
+            self.handled += 1
+        if self.reply and reply and peer:
+            try:
+                sock.sendto(f"{seq} {reply}".encode('utf-8'), peer)
+            except OSError:
+                pass
+
+    def poll(self, timeout=None):
+        """Wait for readiness once and drain every queued datagram"""
+        for key, _ in self.selector.select(timeout):
+            sock = key.fileobj
+            while True:
+                try:
+                    data, peer = sock.recvfrom(512)
+                except (BlockingIOError, InterruptedError):
+                    break
+                self._handle(sock, data, peer)
+
+    def serve_forever(self):
+        self.running = True
+        while self.running:
+            self.poll(timeout=0.5)
+
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"🌐 Network control listening on UDP port {self.port}"
+              + (f" and {self.unix_path}" if self.unix_path else ""))
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        for sock in self.sockets:
+            self.selector.unregister(sock)
+            sock.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def get_stats(self):
+        return {
+            'received': self.received,
+            'handled': self.handled,
+            'dropped': self.dropped,
+            'malformed': self.malformed,
+            'dispatch_errors': self.dispatch_errors,
+        }
+
+def load_generator(host="127.0.0.1", port=DEFAULT_PORT, rate_hz=200, duration=5.0):
+    """Stream joystick-style commands and measure reply round trips"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sent_at = {}
+    rtts = []
+    period = 1.0 / rate_hz
+    seq = 0
+    next_send = time.monotonic()
+    end = next_send + duration
+
+    while time.monotonic() < end:
+        now = time.monotonic()
+        if now >= next_send:
+            seq += 1
+            sent_at[seq] = time.monotonic_ns()
+            sock.sendto(f"{seq} forward {seq % 101}".encode(), (host, port))
+            next_send += period
+        try:
+            data, _ = sock.recvfrom(512)
+            reply_seq = int(data.split(None, 1)[0])
+            if reply_seq in sent_at:
+                rtts.append(time.monotonic_ns() - sent_at.pop(reply_seq))
+        except BlockingIOError:
+            time.sleep(min(0.0002, max(0.0, next_send - time.monotonic())))
+    sock.close()
+
+    rtts.sort()
+    return {
+        'sent': seq,
+        'replies': len(rtts),
+        'p50_us': rtts[len(rtts) // 2] / 1000 if rtts else None,
+        'p99_us': rtts[int(len(rtts) * 0.99)] / 1000 if rtts else None,
+        'max_us': rtts[-1] / 1000 if rtts else None,
+    }
+
+def main():
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--load":
+        # Load a running server: python3 net_lib.py --load [host] [rate_hz] [seconds]
+        host = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1"
+        rate = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+        duration = float(sys.argv[4]) if len(sys.argv) > 4 else 5.0
+        print(load_generator(host, DEFAULT_PORT, rate, duration))
+        return
+
+    # Loopback benchmark of the control core: dispatcher + drive mixer, no radio
+    import contextlib
+    import io
+    from bt_lib import BT
+    from drive_lib import DriveMixer
+
+    print("🌐 Loopback control benchmark")
+    print("=============================")
+    dispatcher = BT()
+    drive = DriveMixer(lambda duty: True, lambda duty: True)
+    dispatcher.pin_control = lambda message: None
+    dispatcher.drive_control = drive.control
+
+    def quiet_dispatch(message):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return dispatcher.dispatch(message)
+
+    server = NetServer(quiet_dispatch, host="127.0.0.1", port=0)
+    server.start()
+    for rate in (100, 500, 1000):
+        result = load_generator("127.0.0.1", server.port, rate, duration=2.0)
+        print(f"{rate:5d}Hz: {result}")
+    server.stop()
+    print(f"server: {server.get_stats()} mixer: {drive.get_stats()}")
+
+if __name__ == "__main__":
+    main()
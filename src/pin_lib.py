@@ -1,16 +1,19 @@
 # combination of pin_lib, bt_lib and auto_run receive message via bluetooth
 # and control P9_14.
 
-from periphery import GPIO
 import time
 import threading
 
 class PIN:
-    def __init__(self):
+    def __init__(self, line=None):
         print("Run Pin Control")
-        self.P9_12 = GPIO("/dev/gpiochip0", 28, "out")
+        if line is None:
+            from periphery import GPIO  # deferred: only the actuator side needs it
+            line = GPIO("/dev/gpiochip0", 28, "out")
+        self.P9_12 = line  # or an InheritedLine after a hot restart
         self.motor_stop_event = threading.Event()
         self.motor_thread = None
+        self.p9_12_mode = 0  # shadow of the last command: 0 off, 1 on, 2 blinking
     def _motor_control_loop(self):
         """Run the motor control loop in a separate thread"""
         while not self.motor_stop_event.is_set():
@@ -21,6 +24,11 @@ class PIN:
             self.P9_12.write(False)
             time.sleep(0.5)
     
+    def restore(self, mode, policy):
+        """Re-apply a checkpointed P9_12 mode unless the policy says otherwise"""
+        if policy.get("P9_12", "zero") == "restore" and mode in (1, 2):
+            self.set_pin_9_12(mode)
+
     def set_pin_9_12(self, message):
         print ("set_p_9_12 invoked with: ", message)
         
@@ -29,6 +37,8 @@ class PIN:
         if self.motor_thread and self.motor_thread.is_alive():
             self.motor_thread.join(timeout=1.0)  # Wait up to 1 second for thread to stop
         self.motor_stop_event.clear()
+        if message in (0, 1, 2):
+            self.p9_12_mode = message
         
         if message == 1:
             self.P9_12.write(True)
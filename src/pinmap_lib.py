@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+PWM chip-to-header-pin resolver for the BeagleBone Black
+Reads the /sys/class/pwm/pwmchipN/device links, the ePWM/eCAP register base
+addresses and the pinmux state in one pass, instead of watching LEDs
+"""
+
+import os
+import sys
+import time
+
+# Register base -> (PWM module, channel -> header pins that can carry it)
+PWM_MODULES = {
+    0x48300100: ("ecap0", {0: ("P9_42",)}),
+    0x48300200: ("ehrpwm0", {0: ("P9_22", "P9_31"), 1: ("P9_21", "P9_29")}),
+    0x48302100: ("ecap1", {}),  # not routed to the P8/P9 headers
+    0x48302200: ("ehrpwm1", {0: ("P9_14", "P8_36"), 1: ("P9_16", "P8_34")}),
+    0x48304100: ("ecap2", {0: ("P9_28",)}),
+    0x48304200: ("ehrpwm2", {0: ("P8_19", "P8_45"), 1: ("P8_13", "P8_46")}),
+}
+# Header pin -> (pad register in the control module, mux mode selecting PWM)
+PAD_PWM_MODE = {
+    "P8_13": (0x44E10824, 4), "P8_19": (0x44E10820, 4),
+    "P8_34": (0x44E108CC, 2), "P8_36": (0x44E108C8, 2),
+    "P8_45": (0x44E108A0, 3), "P8_46": (0x44E108A4, 3),
+    "P9_14": (0x44E10848, 6), "P9_16": (0x44E1084C, 6),
+    "P9_21": (0x44E10954, 3), "P9_22": (0x44E10950, 3),
+    "P9_28": (0x44E1099C, 4), "P9_29": (0x44E10994, 1),
+    "P9_31": (0x44E10990, 1), "P9_42": (0x44E10964, 0),
+}
+PINCTRL_PINS = "sys/kernel/debug/pinctrl/44e10800.pinmux-pinctrl-single/pins"
+OCP_PINMUX_STATE = "sys/devices/platform/ocp/ocp:{pin}_pinmux/state"  # cape-universal
+
+class PinMapping:
+    __slots__ = ('pin', 'chip', 'channel', 'module', 'muxed')
+
+    def __init__(self, pin, chip, channel, module, muxed):
+        self.pin = pin
+        self.chip = chip
+        self.channel = channel
+        self.module = module  # e.g. "ehrpwm1"
+        self.muxed = muxed  # True/False, or None when the pinmux is unreadable
+
+    def __repr__(self):
+        mux = {True: "pwm", False: "not muxed", None: "mux unknown"}[self.muxed]
+        return f"{self.pin} -> pwmchip{self.chip}/{self.channel} ({self.module}, {mux})"
+
+def _pad_modes(root):
+    """Pad register -> mux mode from the pinctrl debugfs file (root only)"""
+    modes = {}
+    try:
+        with open(os.path.join(root, PINCTRL_PINS)) as f:
+            lines = f.readlines()
+    except OSError:
+        return modes
+    for line in lines:
+        # pin 18 (PIN18) 44e10848 00000006 pinctrl-single
+        # newer kernels add a GPIO range column before the register address,
+        # so count from the end
+        fields = line.split()
+        if len(fields) < 5 or fields[0] != "pin":
+            continue
+        try:
+            modes[int(fields[-3], 16)] = int(fields[-2], 16) & 0x7
+        except ValueError:
+            continue
+    return modes
+
+def _muxed(root, pin, pad_modes):
+    pad, mode = PAD_PWM_MODE[pin]
+    if pad in pad_modes:
+        return pad_modes[pad] == mode
+    try:
+        with open(os.path.join(root, OCP_PINMUX_STATE.format(pin=pin))) as f:
+            return f.read().strip() == "pwm"
+    except OSError:
+        return None
+
+def resolve(root="/"):
+    """Header pin -> PinMapping for every PWM channel the kernel exposes"""
+    pwm_class = os.path.join(root, "sys/class/pwm")
+    try:
+        chips = [name for name in os.listdir(pwm_class) if name.startswith("pwmchip")]
+    except OSError:
+        return {}
+    pad_modes = _pad_modes(root)
+    mapping = {}
+    for name in sorted(chips, key=lambda n: int(n[len("pwmchip"):])):
+        chip = int(name[len("pwmchip"):])
+        try:
+            # .../48300000.epwmss/48302200.pwm -> 0x48302200
+            device = os.path.basename(os.readlink(os.path.join(pwm_class, name, "device")))
+            module, channels = PWM_MODULES[int(device.split(".", 1)[0], 16)]
+        except (OSError, ValueError, KeyError):
+            continue
+        try:
+            with open(os.path.join(pwm_class, name, "npwm")) as f:
+                npwm = int(f.read())
+        except (OSError, ValueError):
+            npwm = len(channels)
+        for channel, pins in channels.items():
+            if channel < npwm:
+                for pin in pins:
+                    mapping[pin] = PinMapping(pin, chip, channel, module, _muxed(root, pin, pad_modes))
+    return mapping
+
+def lookup(mapping, pin, chip, channel):
+    """(chip, channel) for a header pin, or the given default when unresolved"""
+    entry = mapping.get(pin)
+    return (entry.chip, entry.channel) if entry else (chip, channel)
+
+def build_fake_root(root, chips=((0, 0x48302200), (1, 0x48304200)), pwm_pins=("P9_14", "P8_13", "P8_19")):
+    """Minimal sysfs tree as on this car: ehrpwm1 and ehrpwm2 enabled"""
+    pwm_class = os.path.join(root, "sys/class/pwm")
+    os.makedirs(pwm_class, exist_ok=True)
+    for chip, base in chips:
+        epwmss = base & ~0xFFF
+        device = os.path.join(root, f"sys/devices/platform/ocp/{epwmss:08x}.epwmss/{base:08x}.pwm")
+        os.makedirs(device, exist_ok=True)
+        os.makedirs(os.path.join(device, "pwm", f"pwmchip{chip}"), exist_ok=True)
+        with open(os.path.join(device, "pwm", f"pwmchip{chip}", "npwm"), "w") as f:
+            f.write("2\n")
+        os.symlink(os.path.join(device, "pwm", f"pwmchip{chip}"), os.path.join(pwm_class, f"pwmchip{chip}"))
+        os.symlink(device, os.path.join(device, "pwm", f"pwmchip{chip}", "device"))
+    # pinctrl debugfs, in both the old and the gpio-range line formats, plus a
+    # bad line. P9_16 is in GPIO mode (7) here, which must win over its
+    # cape-universal state file below claiming "pwm".
+    pinctrl = os.path.join(root, PINCTRL_PINS)
+    os.makedirs(os.path.dirname(pinctrl), exist_ok=True)
+    with open(pinctrl, "w") as f:
+        f.write("registered pins: 142\n")
+        for index, pin in enumerate(pwm_pins + ("P9_16",)):
+            pad, mode = PAD_PWM_MODE[pin]
+            number = (pad - 0x44E10800) // 4
+            gpio_range = "0:gpio-0-31 " if index % 2 else ""
+            f.write(f"pin {number} (PIN{number}) {gpio_range}{pad:08x} "
+                    f"{mode if pin in pwm_pins else 7:08x} pinctrl-single\n")
+        f.write("pin 200 (PIN200) not-an-address 00000000 pinctrl-single\n")
+    for pin in PAD_PWM_MODE:
+        state = os.path.join(root, OCP_PINMUX_STATE.format(pin=pin))
+        os.makedirs(os.path.dirname(state), exist_ok=True)
+        with open(state, "w") as f:
+            f.write("pwm\n" if pin in pwm_pins + ("P9_16",) else "default\n")
+
+def main():
+    # python3 pinmap_lib.py [root]      resolve a (real or copied) sysfs tree
+    # python3 pinmap_lib.py --fake      check against a generated tree
+    import tempfile
+    if "--fake" in sys.argv:
+        root = tempfile.mkdtemp()
+        build_fake_root(root)
+    else:
+        root = next((arg for arg in sys.argv[1:] if not arg.startswith("--")), "/")
+    start = time.perf_counter()
+    mapping = resolve(root)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"📍 PWM header pins under {root}: {len(mapping)} resolved in {elapsed_ms:.2f}ms")
+    print("=" * 50)
+    for entry in sorted(mapping.values(), key=lambda e: (e.chip, e.channel, not e.muxed)):
+        print(f"  {entry}")
+    if "--fake" in sys.argv:
+        # PWMController's hardcoded fallback pairs
+        expected = {"P9_14": (0, 0), "P8_13": (1, 1), "P8_19": (1, 0)}
+        got = {pin: lookup(mapping, pin, None, None) for pin in expected}
+        # P9_16: debugfs says GPIO, its state file says pwm; debugfs wins
+        modes = _pad_modes(root)
+        if (got != expected or not all(mapping[pin].muxed for pin in expected)
+                or len(modes) != 4 or mapping["P9_16"].muxed is not False):
+            print(f"❌ Expected {expected}, got {got}")
+            sys.exit(1)
+        print("✅ Matches the hand-built pin table")
+
+if __name__ == "__main__":
+    main()
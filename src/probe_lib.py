@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Hardware probe cache for the BeagleBone Black toy-car
+PWM chips, channels, pin mapping and boot configuration are probed once, in
+parallel across chips, and reused until the kernel, uEnv.txt or the applied
+overlays change. Only clean probes are stored, so a cached result always had
+the car pins muxed; exports and config-pin changes since then are not seen.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from pinmap_lib import PinMapping, resolve
+
+PROBE_CACHE_PATH = "/var/lib/autobbb/probe_cache.json"
+UENV_PATH = "boot/uEnv.txt"
+OVERLAYS_PATH = "proc/device-tree/chosen/overlays"  # one entry per overlay U-Boot applied
+PROBE_VERSION = 3  # bump when the result layout changes
+CAR_PINS = ("P9_14", "P8_13", "P8_19")  # lamps, left motor, right motor
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def kernel_release(root="/"):
+    if root == "/":
+        return os.uname().release
+    return _read(os.path.join(root, "proc/sys/kernel/osrelease"))
+
+def _stat_key(path):
+    """(mtime_ns, size) of a path, None when it is missing"""
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+def fingerprint(root="/"):
+    """Kernel release, uEnv.txt mtime/size and the overlays node's mtime: stat calls only"""
+    return json.dumps({'kernel': kernel_release(root),
+                       'uenv': _stat_key(os.path.join(root, UENV_PATH)),
+                       'overlays': _stat_key(os.path.join(root, OVERLAYS_PATH)),
+                       'version': PROBE_VERSION}, sort_keys=True)
+
+def parse_uenv(root="/"):
+    """The overlay settings the boot-config scripts grep for"""
+    boot = {'enable_uboot_overlays': False, 'overlays': [], 'disabled': []}
+    text = _read(os.path.join(root, UENV_PATH)) or ""
+    for line in text.splitlines():
+        key, sep, value = line.strip().partition("=")
+        if not sep or key.startswith("#"):
+            continue
+        if key == "enable_uboot_overlays":
+            boot['enable_uboot_overlays'] = value.strip() == "1"
+        elif key.startswith("uboot_overlay_addr") or key == "dtb_overlay":
+            boot['overlays'].append(value.strip())
+        elif key.startswith("disable_uboot_overlay_") and value.strip() == "1":
+            boot['disabled'].append(key[len("disable_uboot_overlay_"):])
+    return boot
+
+def probe_chip(root, name):
+    """Read-only probe of one pwmchip: no export, enable or sleep"""
+    # Only what the fingerprint covers: enable and period change on every run
+    chip_path = os.path.join(root, "sys/class/pwm", name)
+    chip = int(name[len("pwmchip"):])
+    npwm = int(_read(os.path.join(chip_path, "npwm")) or 0)
+    channels = {}
+    for channel in range(npwm):
+        pwm_path = os.path.join(chip_path, f"pwm{channel}")
+        channels[channel] = {'exported': os.path.isdir(pwm_path)}
+    try:
+        device = os.path.basename(os.readlink(os.path.join(chip_path, "device")))
+    except OSError:
+        device = None
+    return {'chip': chip, 'device': device, 'npwm': npwm, 'channels': channels,
+            'chardev': os.path.exists(os.path.join(root, f"dev/pwmchip{chip}"))}
+
+def probe(root="/"):
+    """Full probe; every chip on its own thread"""
+    try:
+        names = [name for name in os.listdir(os.path.join(root, "sys/class/pwm")) if name.startswith("pwmchip")]
+    except OSError:
+        names = []
+    chips = {}
+    threads = [threading.Thread(target=lambda name=name: chips.__setitem__(name, probe_chip(root, name)))
+               for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    pins = resolve(root)
+    boot = parse_uenv(root)
+    problems = []
+    if not boot['enable_uboot_overlays']:
+        problems.append("uEnv.txt: enable_uboot_overlays=1 is not set")
+    if not chips:
+        problems.append("no pwmchip in /sys/class/pwm: PWM overlays not loaded")
+    for pin in CAR_PINS:
+        if pin not in pins:
+            problems.append(f"{pin}: no PWM chip exposes it")
+        elif pins[pin].muxed is False:
+            problems.append(f"{pin}: not muxed to PWM")
+    return {
+        'chips': {str(info['chip']): info for info in chips.values()},
+        'pins': {pin: {slot: getattr(entry, slot) for slot in PinMapping.__slots__}
+                 for pin, entry in pins.items()},
+        'boot': boot,
+        'problems': problems,
+    }
+
+class ProbeCache:
+    """Probe results stored on disk under the hardware fingerprint"""
+
+    def __init__(self, path=PROBE_CACHE_PATH, root="/"):
+        self.path = path
+        self.root = root
+        self.results = None
+        self.hit = False
+        self.load_s = None
+
+    def load(self, force=False):
+        """Cached results when the fingerprint matches, else probe and store"""
+        start = time.perf_counter()
+        key = fingerprint(self.root)
+        cached = None
+        if not force:
+            try:
+                with open(self.path) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                pass
+        self.hit = bool(cached) and cached.get('fingerprint') == key
+        if self.hit:
+            self.results = cached['results']
+        else:
+            self.results = probe(self.root)
+            # Problems are usually being fixed (config-pin, overlays): keep
+            # probing until a clean result is worth reusing
+            if not self.results['problems']:
+                self._store(key)
+        self.load_s = time.perf_counter() - start
+        return self.results
+
+    def _store(self, key):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({'fingerprint': key, 'probed_at': time.time(), 'results': self.results}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️  Probe cache not written: {e}")
+
+    def pin_map(self):
+        """Header pin -> PinMapping, as pinmap_lib.resolve() returns it"""
+        return {pin: PinMapping(**entry) for pin, entry in self.results['pins'].items()}
+
+def main():
+    # python3 probe_lib.py [--force] [--fake] [root]: probe or reuse the cache
+    import tempfile
+    root = next((arg for arg in sys.argv[1:] if not arg.startswith("--")), "/")
+    path = PROBE_CACHE_PATH
+    if "--fake" in sys.argv:
+        from pinmap_lib import build_fake_root
+        root = tempfile.mkdtemp()
+        build_fake_root(root)
+        path = os.path.join(root, "probe_cache.json")
+
+    cache = ProbeCache(path, root)
+    results = cache.load(force="--force" in sys.argv)
+    print(f"🔎 Hardware probe ({'cached' if cache.hit else 'probed'}) in {cache.load_s * 1e6:.0f}us")
+    print("=" * 50)
+    for chip, info in sorted(results['chips'].items()):
+        exported = [str(ch) for ch, state in info['channels'].items() if state['exported']]
+        print(f"  pwmchip{chip}: {info['device']}, {info['npwm']} channels, exported [{', '.join(exported)}]"
+              f"{', chardev' if info['chardev'] else ''}")
+    for entry in cache.pin_map().values():
+        print(f"  {entry}")
+    for problem in results['problems']:
+        print(f"  ⚠️  {problem}")
+
+    if "--fake" in sys.argv:
+        # The fake tree has no uEnv.txt: that probe must not have been stored.
+        # Once clean, the next load comes from the cache until uEnv.txt changes.
+        stored_with_problems = os.path.exists(path)
+        uenv = os.path.join(root, UENV_PATH)
+        os.makedirs(os.path.dirname(uenv), exist_ok=True)
+        with open(uenv, "w") as f:
+            f.write("enable_uboot_overlays=1\n")
+        probed = ProbeCache(path, root)
+        probed.load()
+        again = ProbeCache(path, root)
+        again.load()
+        with open(uenv, "a") as f:
+            f.write("uboot_overlay_addr4=/lib/firmware/BB-PWM1-00A0.dtbo\n")
+        changed = ProbeCache(path, root)
+        changed.load()
+        print(f"  probe {probed.load_s * 1e6:.0f}us, cache hit {again.load_s * 1e6:.0f}us, "
+              f"after a uEnv.txt change: cached={changed.hit}, probe with problems stored={stored_with_problems}")
+        if stored_with_problems or not again.hit or changed.hit:
+            print("❌ Cache did not follow the fingerprint")
+            sys.exit(1)
+        print("✅ Cache reused until the fingerprint changed")
+
+if __name__ == "__main__":
+    main()
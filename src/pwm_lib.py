@@ -5,34 +5,171 @@ Direct control of specific PWM pins: P9_14, P8_13, P8_19
 Simplified version with dedicated controllers for each pin
 """
 
+import importlib
 import os
+import threading
 import time
 import math
 
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def _write_attr(path, value):
+    with open(path, "w") as f:
+        f.write(str(value))
+
+def wait_for_attributes(pwm_path, timeout=1.0, poll_s=0.001):
+    """Poll until an exported channel's attributes are writable; returns seconds waited"""
+    # The pwmN directory appears during the export write, but udev may still be
+    # fixing group/permissions on its files for a while afterwards
+    start = time.monotonic()
+    paths = [f"{pwm_path}/{name}" for name in ("period", "duty_cycle", "enable")]
+    while not all(os.access(path, os.W_OK) for path in paths):
+        if time.monotonic() - start > timeout:
+            raise TimeoutError(f"{pwm_path} not ready after {timeout}s")
+        time.sleep(poll_s)
+    return time.monotonic() - start
+
+class Capabilities:
+    """What a PWM backend can do; used to pick one per pin"""
+    __slots__ = ('resolution_ns', 'max_frequency_hz', 'atomic_update', 'update_cost_us')
+    
+    def __init__(self, resolution_ns, max_frequency_hz, atomic_update, update_cost_us):
+        self.resolution_ns = resolution_ns  # smallest period/duty step
+        self.max_frequency_hz = max_frequency_hz
+        self.atomic_update = atomic_update  # period and duty change together
+        self.update_cost_us = update_cost_us  # typical duty write on the BBB
+    
+    def rank(self):
+        """Sort key, best first: finest resolution, then atomic, then cheapest"""
+        return (self.resolution_ns, not self.atomic_update, self.update_cost_us)
+
+# Backend name -> (module, class); imported only when selected
+PWM_BACKENDS = {
+    "chardev": ("pwmdev_lib", "ChardevPWMPin"),
+    "sysfs": ("pwm_lib", "PWMPin"),
+    "periphery": ("pwmbackend_lib", "PeripheryPWMPin"),
+    "software": ("pwmbackend_lib", "SoftwarePWMPin"),
+    "fake": ("pwmbackend_lib", "FakePWMPin"),
+}
+# Tried by "auto"; software PWM needs the pins muxed as GPIO, so only on request
+AUTO_BACKENDS = ("chardev", "sysfs", "periphery")
+
+def pwm_backend(name):
+    """Pin class implementing a backend"""
+    module, cls = PWM_BACKENDS[name]
+    return getattr(importlib.import_module(module), cls)
+
+def backend_candidates(backend):
+    """Backends to try in order: the requested one, then slower hardware paths"""
+    if backend != "auto" and backend not in PWM_BACKENDS:
+        raise ValueError(f"unknown PWM backend '{backend}', "
+                         f"expected one of: auto, {', '.join(PWM_BACKENDS)}")
+    if backend == "auto":
+        return sorted(AUTO_BACKENDS, key=lambda name: pwm_backend(name).capabilities.rank())
+    if backend not in AUTO_BACKENDS:
+        return [backend]
+    rank = pwm_backend(backend).capabilities.rank()
+    return [backend] + sorted((name for name in AUTO_BACKENDS
+                               if pwm_backend(name).capabilities.rank() > rank),
+                              key=lambda name: pwm_backend(name).capabilities.rank())
+
+def retune_order(old_period_ns, old_duty_ns, period_ns, duty_ns):
+    """Attributes to write, in an order where duty never exceeds the period"""
+    # Shrinking: the new duty already fits the old period. Growing: the old
+    # duty still fits the new period. Unchanged attributes are not written.
+    writes = []
+    if period_ns < old_period_ns:
+        if duty_ns != old_duty_ns:
+            writes.append("duty")
+        writes.append("period")
+    else:
+        if period_ns != old_period_ns:
+            writes.append("period")
+        if duty_ns != old_duty_ns:
+            writes.append("duty")
+    return writes
+
+class ToneTable:
+    """Period/duty pairs precomputed for a fixed set of frequencies"""
+    
+    def __init__(self, frequencies, duty_percent=50):
+        self.duty_percent = duty_percent
+        self.entries = {}  # frequency -> (period_ns, duty_ns, encoded period, encoded duty)
+        for frequency in frequencies:
+            period_ns = int(1000000000 / frequency)
+            duty_ns = int(period_ns * duty_percent / 100)
+            self.entries[frequency] = (period_ns, duty_ns, str(period_ns).encode(), str(duty_ns).encode())
+    
+    def prepare(self, pin):
+        """Warm a chardev pin's rounded-waveform cache so playback never rounds"""
+        if hasattr(pin, 'round'):
+            for period_ns, duty_ns, _, _ in self.entries.values():
+                pin.round(period_ns, duty_ns)
+    
+    def play(self, pin, frequency):
+        """Switch pin to a table frequency; returns the writes made"""
+        period_ns, duty_ns, period_text, duty_text = self.entries[frequency]
+        return pin.retune_ns(period_ns, duty_ns, self.duty_percent, encoded=(period_text, duty_text))
+
 class PWMController:
     """Direct PWM control with hardcoded pin configurations"""
     
-    def __init__(self):
-        # Hardcoded PWM configurations
-        self.p9_14 = PWMPin("P9_14", chip=0, channel=0)  # PWM0.0
-        self.p8_13 = PWMPin("P8_13", chip=1, channel=1)  # PWM1.1  
-        self.p8_19 = PWMPin("P8_19", chip=1, channel=0)  # PWM1.0
+    def __init__(self, backend="sysfs", pin_map=None):
+        # A PWM_BACKENDS name or "auto"; pins that fail to start fall back
+        # to the next candidate (e.g. chardev -> sysfs on kernels before 6.13)
+        self.backend = backend
+        self.candidates = backend_candidates(backend)
+        pin_class = pwm_backend(self.candidates[0])
+        # Header pin -> (chip, channel) from the sysfs device links (pinmap_lib);
+        # the hardcoded pairs apply when that cannot be resolved
+        from pinmap_lib import lookup, resolve
+        pin_map = resolve() if pin_map is None else pin_map
+        self.p9_14 = pin_class("P9_14", *lookup(pin_map, "P9_14", 0, 0))  # PWM0.0
+        self.p8_13 = pin_class("P8_13", *lookup(pin_map, "P8_13", 1, 1))  # PWM1.1  
+        self.p8_19 = pin_class("P8_19", *lookup(pin_map, "P8_19", 1, 0))  # PWM1.0
         
         self.pins = [self.p9_14, self.p8_13, self.p8_19]
+        for pin in self.pins:
+            if pin.name in pin_map and pin_map[pin.name].muxed is False:
+                print(f"⚠️  {pin.name} is not muxed to PWM (config-pin {pin.name} pwm)")
         self.frequency = 1000  # 1kHz default
         
     def start_all(self, frequency=None):
-        """Start all PWM pins"""
+        """Start all PWM pins in parallel, adopting channels left exported"""
         freq = frequency or self.frequency
-        success_count = 0
+        results = {}
         
         print(f"🚀 Starting hardcoded PWM pins at {freq}Hz...")
+        start = time.monotonic()
         
+        # Each export waits on sysfs/udev independently: no reason to queue them
+        threads = [threading.Thread(target=lambda pin=pin: results.__setitem__(pin.name, pin.start(freq)))
+                   for pin in self.pins]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # e.g. a kernel or driver without the chardev waveform ioctls
         for pin in self.pins:
-            if pin.start(freq):
-                success_count += 1
+            for name in self.candidates[1:]:
+                if results[pin.name]:
+                    break
+                fallback = pwm_backend(name)(pin.name, pin.chip, pin.channel)
+                results[pin.name] = fallback.start(freq)
+                setattr(self, pin.name.lower(), fallback)
+        self.pins = [self.p9_14, self.p8_13, self.p8_19]
         
-        print(f"✅ {success_count}/{len(self.pins)} pins started")
+        success_count = sum(1 for ok in results.values() if ok)
+        adopted = [pin.name for pin in self.pins if pin.adopted]
+        print(f"✅ {success_count}/{len(self.pins)} pins started in {(time.monotonic() - start) * 1000:.1f}ms"
+              + (f" (adopted {', '.join(adopted)})" if adopted else ""))
+        print(f"🔧 PWM backends: {', '.join(f'{name} {backend}' for name, backend in self.get_backends().items())}")
         return success_count > 0
     
     def set_p9_14_duty(self, percent):
@@ -55,12 +192,42 @@ class PWMController:
                 success_count += 1
         return success_count
     
-    def stop_all(self):
-        """Stop all PWM pins"""
+    def stop_all(self, unexport=False):
+        """Stop all PWM pins; channels stay exported for the next run unless asked"""
         for pin in self.pins:
-            pin.stop()
+            pin.stop(unexport=unexport)
         print("⏹️ All PWM pins stopped")
     
+    def checkpoint(self):
+        """Shadow state of every active pin, for checkpoint_lib"""
+        return {pin.name: {'period_ns': pin.period_ns, 'duty_percent': pin.duty_percent}
+                for pin in self.pins if pin.is_active}
+    
+    def restore(self, saved, policy):
+        """Re-apply saved periods and duties in one pass, per-pin policy
+        "restore", "zero" (period only) or "skip"; returns the pins restored"""
+        restored = []
+        for pin in self.pins:
+            entry = saved.get(pin.name)
+            action = policy.get(pin.name, "zero")
+            if not pin.is_active or entry is None or action == "skip":
+                continue
+            pin.retune_ns(entry['period_ns'], 0, 0)
+            if action == "restore" and entry['duty_percent']:
+                pin.set_duty_cycle(entry['duty_percent'])
+            restored.append(pin.name)
+        if restored:
+            print(f"💾 Restored {', '.join(f'{pin.name} {pin.duty_percent}%' for pin in self.pins if pin.name in restored)}")
+        return restored
+    
+    def get_backends(self):
+        """Backend each pin ended up on"""
+        return {pin.name: pin.backend for pin in self.pins}
+    
+    def duty_step(self, pin):
+        """Smallest duty change in percent the pin's backend can express"""
+        return 100.0 * pin.capabilities.resolution_ns / pin.period_ns if pin.period_ns else 0.0
+    
     def get_active_pins(self):
         """Get list of active pin names"""
         return [pin.name for pin in self.pins if pin.is_active]
@@ -121,6 +288,11 @@ class PWMController:
 class PWMPin:
     """Individual PWM pin controller"""
     
+    backend = "sysfs"
+    # eHRPWM/eCAP clocked at 100 MHz; each write is one pwrite() on an open fd
+    capabilities = Capabilities(resolution_ns=10, max_frequency_hz=1000000,
+                                atomic_update=False, update_cost_us=25)
+    
     def __init__(self, name, chip, channel):
         self.name = name
         self.chip = chip
@@ -129,57 +301,112 @@ class PWMPin:
         self.pwm_path = None
         self.chip_path = None
         self.period_ns = None
+        self.duty_fd = None  # kept open for fast writes and the e-stop path
+        self.period_fd = None  # opened on the first retune
+        self.lockout = False  # set by the e-stop; blocks normal duty writes
+        self.duty_percent = 0  # shadow of the last duty written
+        self.adopted = False  # channel was already exported when started
+        self.start_s = None  # time start() took
     
     def start(self, frequency):
-        """Start this PWM pin"""
+        """Start this PWM pin, adopting the channel if it is still exported"""
         try:
+            start = time.monotonic()
             self.pwm_path = f"/sys/class/pwm/pwmchip{self.chip}/pwm{self.channel}"
             self.chip_path = f"/sys/class/pwm/pwmchip{self.chip}"
             
-            # Export if needed
-            if not os.path.exists(self.pwm_path):
+            # Export if needed, then wait only as long as sysfs/udev actually take
+            self.adopted = os.path.exists(self.pwm_path)
+            if not self.adopted:
                 with open(f"{self.chip_path}/export", "w") as f:
                     f.write(str(self.channel))
-                time.sleep(0.1)
+            wait_for_attributes(self.pwm_path)
             
-            # Configure period
-            self.period_ns = int(1000000000 / frequency)
-            with open(f"{self.pwm_path}/period", "w") as f:
-                f.write(str(self.period_ns))
+            # Set initial duty cycle to 0 first: a leftover duty larger than
+            # the new period would make the period write fail
+            _write_attr(f"{self.pwm_path}/duty_cycle", 0)
+            self.duty_percent = 0
             
-            # Set initial duty cycle to 0
-            with open(f"{self.pwm_path}/duty_cycle", "w") as f:
-                f.write("0")
+            # Configure period, unless the adopted channel already has it
+            self.period_ns = int(1000000000 / frequency)
+            if _read_int(f"{self.pwm_path}/period") != self.period_ns:
+                _write_attr(f"{self.pwm_path}/period", self.period_ns)
             
             # Enable PWM
-            with open(f"{self.pwm_path}/enable", "w") as f:
-                f.write("1")
+            if _read_int(f"{self.pwm_path}/enable") != 1:
+                _write_attr(f"{self.pwm_path}/enable", 1)
             
+            if self.duty_fd is None:
+                self.duty_fd = os.open(f"{self.pwm_path}/duty_cycle", os.O_WRONLY)
             self.is_active = True
-            print(f"✅ {self.name} PWM initialized: {frequency}Hz")
+            self.start_s = time.monotonic() - start
+            print(f"✅ {self.name} PWM initialized: {frequency}Hz "
+                  f"({'adopted' if self.adopted else 'exported'}, {self.start_s * 1000:.1f}ms)")
             return True
             
         except Exception as e:
             print(f"❌ Failed to setup {self.name}: {e}")
             return False
     
+    def adopt_fd(self, duty_fd, period_ns, duty_percent):
+        """Take over a running channel from a duty_cycle fd; writes nothing"""
+        self.pwm_path = f"/sys/class/pwm/pwmchip{self.chip}/pwm{self.channel}"
+        self.chip_path = f"/sys/class/pwm/pwmchip{self.chip}"
+        self.duty_fd = duty_fd
+        self.period_ns = period_ns
+        self.duty_percent = duty_percent
+        self.adopted = True
+        self.is_active = True
+        print(f"✅ {self.name} PWM adopted at {duty_percent}% duty")
+    
     def set_duty_cycle(self, percent):
         """Set duty cycle for this pin"""
-        if not self.is_active:
+        if not self.is_active or self.lockout:
             return False
         
         try:
-            duty_ns = int(self.period_ns * max(0, min(100, percent)) / 100)
-            with open(f"{self.pwm_path}/duty_cycle", "w") as f:
-                f.write(str(duty_ns))
+            percent = max(0, min(100, percent))
+            duty_ns = int(self.period_ns * percent / 100)
+            os.pwrite(self.duty_fd, str(duty_ns).encode(), 0)
+            self.duty_percent = percent
             return True
             
         except Exception as e:
             print(f"❌ Error setting {self.name} duty cycle: {e}")
             return False
     
-    def stop(self):
-        """Stop this PWM pin"""
+    def retune(self, frequency, duty_percent=None):
+        """Change frequency keeping the duty ratio (or a new one); returns the writes made"""
+        percent = self.duty_percent if duty_percent is None else max(0, min(100, duty_percent))
+        period_ns = int(1000000000 / frequency)
+        return self.retune_ns(period_ns, int(period_ns * percent / 100), percent)
+    
+    def retune_ns(self, period_ns, duty_ns, duty_percent, encoded=None):
+        """Write period and duty in a valid order, skipping unchanged ones"""
+        if not self.is_active or self.lockout:
+            return 0
+        
+        old_duty_ns = int(self.period_ns * self.duty_percent / 100)
+        period_text, duty_text = encoded or (str(period_ns).encode(), str(duty_ns).encode())
+        try:
+            writes = retune_order(self.period_ns, old_duty_ns, period_ns, duty_ns)
+            for attr in writes:
+                if attr == "period":
+                    if self.period_fd is None:
+                        self.period_fd = os.open(f"{self.pwm_path}/period", os.O_WRONLY)
+                    os.pwrite(self.period_fd, period_text, 0)
+                    self.period_ns = period_ns
+                else:
+                    os.pwrite(self.duty_fd, duty_text, 0)
+            self.duty_percent = duty_percent
+            return len(writes)
+        
+        except Exception as e:
+            print(f"❌ Error retuning {self.name}: {e}")
+            return 0
+    
+    def stop(self, unexport=False):
+        """Stop this PWM pin; unexport=True gives the channel back to the kernel"""
         if not self.is_active:
             return
         
@@ -187,14 +414,24 @@ class PWMPin:
             # Set duty cycle to 0
             with open(f"{self.pwm_path}/duty_cycle", "w") as f:
                 f.write("0")
+            self.duty_percent = 0
             
             # Disable PWM
             with open(f"{self.pwm_path}/enable", "w") as f:
                 f.write("0")
             
-            # Unexport
-            with open(f"{self.chip_path}/unexport", "w") as f:
-                f.write(str(self.channel))
+            if self.duty_fd is not None:
+                os.close(self.duty_fd)
+                self.duty_fd = None
+            if self.period_fd is not None:
+                os.close(self.period_fd)
+                self.period_fd = None
+            
+            # Unexport only on request: the next run adopts the channel instead
+            # of paying for export and udev again
+            if unexport:
+                with open(f"{self.chip_path}/unexport", "w") as f:
+                    f.write(str(self.channel))
             
             self.is_active = False
             print(f"⏹️ {self.name} PWM stopped")
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Additional PWM backends for the BeagleBone Black toy-car
+periphery, software GPIO and fake channels behind the same interface as
+pwm_lib.PWMPin, selected through pwm_lib.PWM_BACKENDS
+"""
+
+import sys
+import threading
+import time
+
+from pwm_lib import Capabilities, pwm_backend, retune_order
+
+# Software PWM lines per header pin (pin muxed as GPIO; on 6.x kernels
+# gpiochip0 is GPIO bank 1 and gpiochip3 is bank 0, see pin_lib's P9_12)
+SOFTWARE_LINES = {
+    "P9_14": ("/dev/gpiochip0", 18),  # GPIO1_18
+    "P8_13": ("/dev/gpiochip3", 23),  # GPIO0_23
+    "P8_19": ("/dev/gpiochip3", 22),  # GPIO0_22
+}
+
+class PeripheryPWMPin:
+    """PWM channel through periphery's sysfs wrapper (as in conf_sys)"""
+
+    backend = "periphery"
+    # Same hardware as sysfs, but every property access opens the attribute again
+    capabilities = Capabilities(resolution_ns=10, max_frequency_hz=1000000,
+                                atomic_update=False, update_cost_us=80)
+
+    def __init__(self, name, chip, channel):
+        self.name = name
+        self.chip = chip
+        self.channel = channel
+        self.is_active = False
+        self.pwm = None
+        self.duty_fd = None  # periphery keeps no fd the e-stop could use
+        self.period_ns = None
+        self.lockout = False
+        self.duty_percent = 0
+        self.adopted = False
+        self.start_s = None
+
+    def start(self, frequency):
+        try:
+            from periphery import PWM
+            start = time.monotonic()
+            self.pwm = PWM(self.chip, self.channel)
+            self.pwm.duty_cycle_ns = 0
+            self.period_ns = int(1000000000 / frequency)
+            self.pwm.period_ns = self.period_ns
+            self.pwm.enable()
+            self.duty_percent = 0
+            self.is_active = True
+            self.start_s = time.monotonic() - start
+            print(f"✅ {self.name} PWM initialized: {frequency}Hz (periphery, {self.start_s * 1000:.1f}ms)")
+            return True
+        except Exception as e:
+            print(f"❌ Failed to setup {self.name} via periphery: {e}")
+            return False
+
+    def set_duty_cycle(self, percent):
+        if not self.is_active or self.lockout:
+            return False
+        try:
+            percent = max(0, min(100, percent))
+            self.pwm.duty_cycle_ns = int(self.period_ns * percent / 100)
+            self.duty_percent = percent
+            return True
+        except Exception as e:
+            print(f"❌ Error setting {self.name} duty cycle: {e}")
+            return False
+
+    def retune(self, frequency, duty_percent=None):
+        percent = self.duty_percent if duty_percent is None else max(0, min(100, duty_percent))
+        period_ns = int(1000000000 / frequency)
+        return self.retune_ns(period_ns, int(period_ns * percent / 100), percent)
+
+    def retune_ns(self, period_ns, duty_ns, duty_percent, encoded=None):
+        if not self.is_active or self.lockout:
+            return 0
+        try:
+            old_duty_ns = int(self.period_ns * self.duty_percent / 100)
+            writes = retune_order(self.period_ns, old_duty_ns, period_ns, duty_ns)
+            for attr in writes:
+                if attr == "period":
+                    self.pwm.period_ns = period_ns
+                    self.period_ns = period_ns
+                else:
+                    self.pwm.duty_cycle_ns = duty_ns
+            self.duty_percent = duty_percent
+            return len(writes)
+        except Exception as e:
+            print(f"❌ Error retuning {self.name}: {e}")
+            return 0
+
+    def zero(self):
+        if self.pwm is not None:
+            self.pwm.duty_cycle_ns = 0
+
+    def stop(self, unexport=False):
+        if not self.is_active:
+            return
+        try:
+            self.pwm.duty_cycle_ns = 0
+            self.duty_percent = 0
+            self.pwm.disable()
+            if unexport:
+                self.pwm.close()
+            self.is_active = False
+            print(f"⏹️ {self.name} PWM stopped")
+        except Exception as e:
+            print(f"❌ Error stopping {self.name}: {e}")
+
+class SoftwarePWMPin:
+    """Bit-banged PWM on a GPIO line, for pins without a PWM function muxed"""
+
+    backend = "software"
+    # Bounded by sleep granularity; the (period, high time) pair is swapped as
+    # one reference, so the loop always sees a consistent waveform
+    capabilities = Capabilities(resolution_ns=100000, max_frequency_hz=500,
+                                atomic_update=True, update_cost_us=1)
+
+    def __init__(self, name, chip, channel):
+        self.name = name
+        self.chip = chip
+        self.channel = channel
+        self.is_active = False
+        self.line = None
+        self.duty_fd = None
+        self.period_ns = None
+        self.lockout = False
+        self.duty_percent = 0
+        self.adopted = False
+        self.start_s = None
+        self._waveform = (0.001, 0.0)  # (period_s, high_s)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, frequency):
+        try:
+            from periphery import GPIO
+            start = time.monotonic()
+            if frequency > self.capabilities.max_frequency_hz:
+                print(f"⚠️  {self.name}: software PWM capped at {self.capabilities.max_frequency_hz}Hz")
+                frequency = self.capabilities.max_frequency_hz
+            chip_path, line = SOFTWARE_LINES[self.name]
+            self.line = GPIO(chip_path, line, "out")
+            self.period_ns = int(1000000000 / frequency)
+            self._waveform = (self.period_ns / 1e9, 0.0)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._pwm_loop, name=f"swpwm-{self.name}", daemon=True)
+            self._thread.start()
+            self.is_active = True
+            self.start_s = time.monotonic() - start
+            print(f"✅ {self.name} PWM initialized: {frequency}Hz (software, {self.start_s * 1000:.1f}ms)")
+            return True
+        except Exception as e:
+            print(f"❌ Failed to setup {self.name} as software PWM: {e}")
+            return False
+
+    def _pwm_loop(self):
+        while not self._stop.is_set():
+            period_s, high_s = self._waveform
+            if high_s > 0:
+                self.line.write(True)
+                time.sleep(high_s)
+            if high_s < period_s:
+                self.line.write(False)
+                time.sleep(period_s - high_s)
+
+    def set_duty_cycle(self, percent):
+        if not self.is_active or self.lockout:
+            return False
+        percent = max(0, min(100, percent))
+        period_s = self._waveform[0]
+        self._waveform = (period_s, period_s * percent / 100)
+        self.duty_percent = percent
+        return True
+
+    def retune(self, frequency, duty_percent=None):
+        percent = self.duty_percent if duty_percent is None else max(0, min(100, duty_percent))
+        period_ns = int(1000000000 / min(frequency, self.capabilities.max_frequency_hz))
+        return self.retune_ns(period_ns, int(period_ns * percent / 100), percent)
+
+    def retune_ns(self, period_ns, duty_ns, duty_percent, encoded=None):
+        if not self.is_active or self.lockout:
+            return 0
+        self._waveform = (period_ns / 1e9, duty_ns / 1e9)
+        self.period_ns = period_ns
+        self.duty_percent = duty_percent
+        return 1
+
+    def zero(self):
+        self._waveform = (self._waveform[0], 0.0)
+        if self.line is not None:
+            self.line.write(False)
+
+    def stop(self, unexport=False):
+        if not self.is_active:
+            return
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.line.write(False)
+        self.line.close()
+        self.duty_percent = 0
+        self.is_active = False
+        print(f"⏹️ {self.name} PWM stopped")
+
+class FakePWMPin:
+    """In-memory channel: runs the control stack without hardware and
+    counts what would have been written"""
+
+    backend = "fake"
+    capabilities = Capabilities(resolution_ns=1, max_frequency_hz=1000000000,
+                                atomic_update=True, update_cost_us=0)
+
+    def __init__(self, name, chip, channel):
+        self.name = name
+        self.chip = chip
+        self.channel = channel
+        self.is_active = False
+        self.duty_fd = None
+        self.period_ns = None
+        self.lockout = False
+        self.duty_percent = 0
+        self.adopted = False
+        self.start_s = 0.0
+        self.writes = 0
+
+    def start(self, frequency):
+        self.period_ns = int(1000000000 / frequency)
+        self.duty_percent = 0
+        self.is_active = True
+        print(f"✅ {self.name} PWM initialized: {frequency}Hz (fake)")
+        return True
+
+    def set_duty_cycle(self, percent):
+        if not self.is_active or self.lockout:
+            return False
+        self.duty_percent = max(0, min(100, percent))
+        self.writes += 1
+        return True
+
+    def retune(self, frequency, duty_percent=None):
+        percent = self.duty_percent if duty_percent is None else max(0, min(100, duty_percent))
+        period_ns = int(1000000000 / frequency)
+        return self.retune_ns(period_ns, int(period_ns * percent / 100), percent)
+
+    def retune_ns(self, period_ns, duty_ns, duty_percent, encoded=None):
+        if not self.is_active or self.lockout:
+            return 0
+        self.period_ns = period_ns
+        self.duty_percent = duty_percent
+        self.writes += 1
+        return 1
+
+    def zero(self):
+        self.duty_percent = 0
+
+    def stop(self, unexport=False):
+        self.duty_percent = 0
+        self.is_active = False
+
+def main():
+    # python3 pwmbackend_lib.py: capabilities and the auto order
+    from pwm_lib import PWM_BACKENDS, backend_candidates
+    print("🔧 PWM backends")
+    print("=" * 50)
+    for name in PWM_BACKENDS:
+        caps = pwm_backend(name).capabilities
+        print(f"  {name:10s} resolution {caps.resolution_ns:>6d}ns  max {caps.max_frequency_hz:>10d}Hz  "
+              f"atomic {'yes' if caps.atomic_update else 'no ':3s}  ~{caps.update_cost_us}us/write")
+    print(f"  auto order: {' -> '.join(backend_candidates('auto'))}")
+    for name in sys.argv[1:]:
+        print(f"  {name}: {' -> '.join(backend_candidates(name))}")
+
+if __name__ == "__main__":
+    main()
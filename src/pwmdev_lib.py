@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+PWM character-device backend for the BeagleBone Black toy-car
+/dev/pwmchipN waveform ioctls: period, duty and offset are programmed in one
+call instead of ordered sysfs text writes, with rounded waveforms cached
+"""
+
+import fcntl
+import os
+import struct
+import sys
+import time
+
+from pwm_lib import Capabilities, PWMPin, ToneTable
+
+# struct pwmchip_waveform { __u32 hwpwm; __u32 __pad; __u64 period_length_ns;
+#                           __u64 duty_length_ns; __u64 duty_offset_ns; }
+WAVEFORM = struct.Struct("<IIQQQ")
+ROUNDED_CACHE_SIZE = 1024
+
+def _ioc(direction, nr, size=0):
+    # include/uapi/linux/pwm.h: type 'u', _IOC(dir, type, nr, size)
+    return (direction << 30) | (size << 16) | (ord("u") << 8) | nr
+
+PWM_IOCTL_REQUEST = _ioc(0, 1)
+PWM_IOCTL_FREE = _ioc(0, 2)
+PWM_IOCTL_ROUNDWF = _ioc(3, 3, WAVEFORM.size)
+PWM_IOCTL_GETWF = _ioc(3, 4, WAVEFORM.size)
+PWM_IOCTL_SETROUNDEDWF = _ioc(1, 5, WAVEFORM.size)
+PWM_IOCTL_SETEXACTWF = _ioc(1, 6, WAVEFORM.size)
+
+def chardev_path(chip):
+    return f"/dev/pwmchip{chip}"
+
+class ChardevPWMPin:
+    """PWM channel on /dev/pwmchipN; same interface as pwm_lib.PWMPin"""
+
+    backend = "chardev"
+    capabilities = Capabilities(resolution_ns=10, max_frequency_hz=1000000,
+                                atomic_update=True, update_cost_us=15)
+
+    def __init__(self, name, chip, channel):
+        self.name = name
+        self.chip = chip
+        self.channel = channel
+        self.is_active = False
+        self.chip_fd = None  # holds the channel requested while open
+        self.duty_fd = None  # no sysfs attribute: the e-stop calls zero()
+        self.period_ns = None
+        self.lockout = False  # set by the e-stop; blocks normal duty writes
+        self.duty_percent = 0  # shadow of the last duty written
+        self.adopted = False
+        self.start_s = None
+        self.rounded = {}  # (period, duty, offset) -> packed waveform the hardware produces
+        self.rounds = 0  # ROUNDWF calls, i.e. cache misses
+        self.updates = 0
+        self._zero = None  # preallocated duty-0 waveform for the e-stop
+
+    def start(self, frequency):
+        """Request the channel; False (caller falls back to sysfs) if sysfs holds it, or if the
+        kernel or the driver lacks the waveform ioctls"""
+        try:
+            start = time.monotonic()
+            # No /dev/pwmchipN (kernel < 6.13), or the channel is still
+            # exported through sysfs (EBUSY): fail without touching the export,
+            # so the sysfs fallback adopts the live channel and the output
+            # never drops. The export is only released by an explicit
+            # stop(unexport=True).
+            self.chip_fd = os.open(chardev_path(self.chip), os.O_RDWR)
+            fcntl.ioctl(self.chip_fd, PWM_IOCTL_REQUEST, self.channel)
+            # Drivers without waveform support (tiehrpwm) fail here with
+            # EOPNOTSUPP; the channel was free, so nothing was running
+            self.period_ns = int(1000000000 / frequency)
+            self.set_waveform(self.period_ns, 0)
+            self._zero = self.round(self.period_ns, 0)
+            self.duty_percent = 0
+            self.is_active = True
+            self.start_s = time.monotonic() - start
+            print(f"✅ {self.name} PWM initialized: {frequency}Hz (chardev, {self.start_s * 1000:.1f}ms)")
+            return True
+        except OSError as e:
+            print(f"⚠️  {self.name} chardev PWM unavailable: {e}")
+            if self.chip_fd is not None:
+                os.close(self.chip_fd)
+                self.chip_fd = None
+            return False
+
+    def adopt_fd(self, chip_fd, period_ns, duty_percent):
+        """Take over a running channel from a chip fd that has it requested; writes nothing"""
+        self.chip_fd = chip_fd
+        self.period_ns = period_ns
+        self.duty_percent = duty_percent
+        self._zero = self.round(period_ns, 0)
+        self.adopted = True
+        self.is_active = True
+        print(f"✅ {self.name} PWM adopted at {duty_percent}% duty (chardev)")
+
+    def round(self, period_ns, duty_ns, offset_ns=0):
+        """Waveform the hardware would actually produce, from the cache when known"""
+        key = (period_ns, duty_ns, offset_ns)
+        wf = self.rounded.get(key)
+        if wf is None:
+            buf = bytearray(WAVEFORM.pack(self.channel, 0, period_ns, duty_ns, offset_ns))
+            fcntl.ioctl(self.chip_fd, PWM_IOCTL_ROUNDWF, buf)
+            if len(self.rounded) >= ROUNDED_CACHE_SIZE:
+                self.rounded.clear()
+            wf = self.rounded[key] = bytes(buf)
+            self.rounds += 1
+        return wf
+
+    def set_waveform(self, period_ns, duty_ns, offset_ns=0):
+        """Program period, duty and offset together; returns the duty actually set in ns"""
+        wf = self.round(period_ns, duty_ns, offset_ns)
+        # Already rounded, so the exact variant applies it without a second rounding pass
+        fcntl.ioctl(self.chip_fd, PWM_IOCTL_SETEXACTWF, wf)
+        self.updates += 1
+        return WAVEFORM.unpack(wf)[3]
+
+    def retune(self, frequency, duty_percent=None):
+        """Change frequency keeping the duty ratio (or a new one); returns the ioctls made"""
+        percent = self.duty_percent if duty_percent is None else max(0, min(100, duty_percent))
+        period_ns = int(1000000000 / frequency)
+        return self.retune_ns(period_ns, int(period_ns * percent / 100), percent)
+
+    def retune_ns(self, period_ns, duty_ns, duty_percent, encoded=None):
+        """Period and duty change atomically: a single ioctl, no ordering needed"""
+        if not self.is_active or self.lockout:
+            return 0
+
+        try:
+            self.set_waveform(period_ns, duty_ns)
+            if period_ns != self.period_ns:
+                self.period_ns = period_ns
+                self._zero = self.round(period_ns, 0)
+            self.duty_percent = duty_percent
+            return 1
+
+        except OSError as e:
+            print(f"❌ Error retuning {self.name}: {e}")
+            return 0
+
+    def get_waveform(self):
+        """(period_ns, duty_ns, offset_ns) as currently programmed"""
+        buf = bytearray(WAVEFORM.pack(self.channel, 0, 0, 0, 0))
+        fcntl.ioctl(self.chip_fd, PWM_IOCTL_GETWF, buf)
+        return WAVEFORM.unpack(buf)[2:]
+
+    def set_duty_cycle(self, percent):
+        """Set duty cycle for this pin"""
+        if not self.is_active or self.lockout:
+            return False
+
+        try:
+            percent = max(0, min(100, percent))
+            self.set_waveform(self.period_ns, int(self.period_ns * percent / 100))
+            self.duty_percent = percent
+            return True
+
+        except OSError as e:
+            print(f"❌ Error setting {self.name} duty cycle: {e}")
+            return False
+
+    def zero(self):
+        """E-stop path: one ioctl with a preallocated waveform"""
+        fd = self.chip_fd
+        if fd is not None and self._zero is not None:
+            fcntl.ioctl(fd, PWM_IOCTL_SETEXACTWF, self._zero)
+
+    def stop(self, unexport=False):
+        """Zero and disable the channel, then release it (unexport is sysfs-only)"""
+        if not self.is_active:
+            return
+
+        try:
+            self.set_waveform(self.period_ns, 0)
+            self.duty_percent = 0
+            # A zero period disables the output
+            fcntl.ioctl(self.chip_fd, PWM_IOCTL_SETROUNDEDWF, WAVEFORM.pack(self.channel, 0, 0, 0, 0))
+            fcntl.ioctl(self.chip_fd, PWM_IOCTL_FREE, self.channel)
+            os.close(self.chip_fd)
+            self.chip_fd = None
+            self.is_active = False
+            print(f"⏹️ {self.name} PWM stopped")
+
+        except OSError as e:
+            print(f"❌ Error stopping {self.name}: {e}")
+
+    def get_stats(self):
+        return {
+            'updates': self.updates,
+            'rounded_cached': len(self.rounded),
+            'round_calls': self.rounds,
+        }
+
+def _percentiles(samples_ns):
+    samples = sorted(samples_ns)
+    return samples[len(samples) // 2] / 1000, samples[int(len(samples) * 0.99)] / 1000
+
+def bench(pin, n=2000):
+    """Median/p99 microseconds for duty updates and frequency steps"""
+    duty_ns = []
+    for i in range(n):
+        start = time.perf_counter_ns()
+        pin.set_duty_cycle(i % 100)
+        duty_ns.append(time.perf_counter_ns() - start)
+
+    # Frequency steps through a precomputed tone table at 50% duty
+    tones = ToneTable([1000, 2000, 440, 50])
+    tones.prepare(pin)
+    frequencies = list(tones.entries)
+    step_ns, writes = [], 0
+    for i in range(n // 10):
+        start = time.perf_counter_ns()
+        writes += tones.play(pin, frequencies[i % len(frequencies)])
+        step_ns.append(time.perf_counter_ns() - start)
+    return _percentiles(duty_ns), _percentiles(step_ns), writes / (n // 10)
+
+def main():
+    # python3 pwmdev_lib.py [chip] [channel]: sysfs vs chardev update latency
+    chip = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    channel = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    print(f"⚡ PWM update latency on pwmchip{chip}/{channel}, kernel {os.uname().release}")
+    print("=" * 50)
+
+    for pin_class in (PWMPin, ChardevPWMPin):
+        pin = pin_class(f"bench-{chip}.{channel}", chip=chip, channel=channel)
+        backend = getattr(pin, 'backend', "sysfs")
+        if not pin.start(1000):
+            print(f"  {backend:8s} unavailable")
+            continue
+        try:
+            (duty_med, duty_p99), (step_med, step_p99), writes = bench(pin)
+            print(f"  {backend:8s} duty update {duty_med:6.1f}us (p99 {duty_p99:6.1f}us)  "
+                  f"frequency step {step_med:6.1f}us (p99 {step_p99:6.1f}us, {writes:.1f} writes)")
+            if isinstance(pin, ChardevPWMPin):
+                print(f"  {'':8s} {pin.get_stats()}")
+        finally:
+            # Unexport so the chardev can request the channel next
+            pin.stop(unexport=True)
+
+if __name__ == "__main__":
+    main()
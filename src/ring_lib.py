@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Shared-memory command ring for the BeagleBone Black toy-car
+Single producer (the BLE server), any number of consumer processes,
+per-consumer read cursors and a futex wakeup on the shared sequence word.
+A restarted producer carries on in the existing segment; one it has to
+replace is retired first, and consumers follow the name to the new one
+"""
+
+import contextlib
+import ctypes
+import fcntl
+import os
+import struct
+import time
+
+DEFAULT_NAME = "autobbb_cmd"
+MAGIC = 0x42524241  # "ABRB"
+
+# Header: magic, slot_count, slot_size, max_consumers, write_seq, futex word,
+# generation (bumped when the segment is retired: consumers reattach by name)
+HEADER = struct.Struct("=IIIIQII")
+HEADER_SIZE = 64
+FUTEX_OFFSET = 24
+WRITE_SEQ_OFFSET = 16
+GENERATION_OFFSET = 28
+# Consumer table entry: active, pid, read_seq
+CONSUMER = struct.Struct("=IIQ")
+# Slot header: message sequence (+1; 0 = empty or being written), payload length
+SLOT = struct.Struct("=QI4x")
+
+FUTEX_WAIT = 0
+FUTEX_WAKE = 1
+SYS_FUTEX = {
+    'armv7l': 240, 'armv6l': 240, 'i686': 240,
+    'x86_64': 202, 'aarch64': 98, 'riscv64': 98,
+}.get(os.uname().machine)
+
+# The process's own symbol table already has libc's syscall(); find_library
+# would fork ldconfig at import time
+_libc = ctypes.CDLL(None, use_errno=True)
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def futex_wait(address, expected, timeout=None):
+    """Sleep while the 32-bit word at address equals expected"""
+    if SYS_FUTEX is None:
+        time.sleep(0.001 if timeout is None else min(timeout, 0.001))
+        return
+    ts = None
+    if timeout is not None:
+        ts = ctypes.byref(_Timespec(int(timeout), int((timeout % 1) * 1e9)))
+    _libc.syscall(SYS_FUTEX, ctypes.c_void_p(address), FUTEX_WAIT,
+                  ctypes.c_uint32(expected), ts, None, 0)
+
+def futex_wake(address, count=0x7fffffff):
+    """Wake waiters sleeping on the word at address"""
+    if SYS_FUTEX is not None:
+        _libc.syscall(SYS_FUTEX, ctypes.c_void_p(address), FUTEX_WAKE, count, None, None, 0)
+
+def _attach(name):
+    """Attach to an existing segment without letting the resource tracker unlink it"""
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+def _untrack(shm):
+    """The resource tracker would unlink a created segment when this process
+    exits, even one a hot-restart successor is still publishing into"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+def _unlink(shm):
+    """Remove the segment's name; unlike shm.unlink() this does not unregister
+    it from the resource tracker, which no longer tracks it (see _untrack)"""
+    import _posixshmem
+    _posixshmem.shm_unlink(shm._name)
+
+@contextlib.contextmanager
+def _segment_lock(name):
+    """Exclusive flock on the segment's /dev/shm file (no-op where there is none)"""
+    try:
+        fd = os.open(os.path.join("/dev/shm", name.lstrip("/")), os.O_RDONLY)
+    except OSError:
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+class _Ring:
+    """Common layout handling for producer and consumers"""
+
+    def _map(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        magic, self.slot_count, self.slot_size, self.max_consumers, _, _, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{shm.name} is not a command ring")
+        self.payload_size = self.slot_size - SLOT.size
+        self.slots_offset = HEADER_SIZE + self.max_consumers * CONSUMER.size
+        self._futex = ctypes.c_uint32.from_buffer(self.buf, FUTEX_OFFSET)
+        self.futex_address = ctypes.addressof(self._futex)
+
+    def _slot_offset(self, seq):
+        return self.slots_offset + (seq % self.slot_count) * self.slot_size
+
+    @property
+    def write_seq(self):
+        return struct.unpack_from("=Q", self.buf, WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def generation(self):
+        return struct.unpack_from("=I", self.buf, GENERATION_OFFSET)[0]
+
+    def close(self):
+        """Detach from the shared segment"""
+        if self.shm is None:
+            return
+        del self._futex
+        self.buf = None
+        self.shm.close()
+        self.shm = None
+
+class RingProducer(_Ring):
+    """The single writer: publishes every command into the ring"""
+
+    def __init__(self, name=DEFAULT_NAME, slot_count=256, slot_size=128, max_consumers=8):
+        from multiprocessing import shared_memory
+        size = HEADER_SIZE + max_consumers * CONSUMER.size + slot_count * slot_size
+        shm = None
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left by a previous run, or still in use by a process handing
+            # over (hot restart): carry on in it when the layout matches, so
+            # attached consumers never notice
+            existing = _attach(name)
+            if self._matches(existing, slot_count, slot_size, max_consumers):
+                self._map(existing)
+                self.name = existing.name
+                self.seq = self.write_seq
+                print(f"📡 Command ring '{self.name}' reused at sequence {self.seq}")
+                return
+            self._retire(existing)
+            _unlink(existing)
+            existing.close()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        _untrack(shm)
+        shm.buf[:HEADER_SIZE + max_consumers * CONSUMER.size] = bytes(HEADER_SIZE + max_consumers * CONSUMER.size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, slot_count, slot_size, max_consumers, 0, 0, 0)
+        self._map(shm)
+        self.name = shm.name
+        self.seq = 0
+        print(f"📡 Command ring '{self.name}' ready: {slot_count} slots x {slot_size} bytes")
+
+    @staticmethod
+    def _matches(shm, slot_count, slot_size, max_consumers):
+        if shm.size < HEADER.size:
+            return False
+        magic, slots, size, consumers, _, _, _ = HEADER.unpack_from(shm.buf, 0)
+        return (magic, slots, size, consumers) == (MAGIC, slot_count, slot_size, max_consumers)
+
+    @staticmethod
+    def _retire(shm):
+        """Tell consumers still mapping this segment to reattach by name"""
+        if shm.size < HEADER.size:
+            return
+        # No magic: a consumer looking the name up must not map it again
+        struct.pack_into("=I", shm.buf, 0, 0)
+        generation = struct.unpack_from("=I", shm.buf, GENERATION_OFFSET)[0]
+        struct.pack_into("=I", shm.buf, GENERATION_OFFSET, (generation + 1) & 0xffffffff)
+        futex = ctypes.c_uint32.from_buffer(shm.buf, FUTEX_OFFSET)
+        futex.value = (futex.value + 1) & 0xffffffff
+        futex_wake(ctypes.addressof(futex))
+        del futex
+
+    def publish(self, data):
+        """Publish one message and wake every consumer; returns its sequence"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        data = data[:self.payload_size]
+        seq = self.seq
+        offset = self._slot_offset(seq)
+
+        # Seqlock: mark the slot invalid before touching the payload and
+        # publish its sequence only after, so a lapped reader copying this
+        # slot sees the change on its re-check
+        SLOT.pack_into(self.buf, offset, 0, 0)
+        self.buf[offset + SLOT.size:offset + SLOT.size + len(data)] = data
+        SLOT.pack_into(self.buf, offset, seq + 1, len(data))
+        self.seq = seq + 1
+        struct.pack_into("=Q", self.buf, WRITE_SEQ_OFFSET, self.seq)
+        self._futex.value = (self._futex.value + 1) & 0xffffffff
+        futex_wake(self.futex_address)
+        return seq
+
+    def consumers(self):
+        """Get (pid, read_seq, lag) for every registered consumer"""
+        result = []
+        for i in range(self.max_consumers):
+            active, pid, read_seq = CONSUMER.unpack_from(self.buf, HEADER_SIZE + i * CONSUMER.size)
+            if active:
+                result.append((pid, read_seq, self.seq - read_seq))
+        return result
+
+    def unlink(self):
+        """Retire, close and remove the shared segment"""
+        shm = self.shm
+        if shm is not None:
+            self._retire(shm)
+        self.close()
+        if shm is not None:
+            _unlink(shm)
+
+class RingConsumer(_Ring):
+    """One reader with its own cursor; never blocks the producer"""
+
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+        self._map(_attach(name))
+        self.name = name
+        self.dropped = 0
+        self.reattached = 0
+        self._generation = self.generation
+
+        # Claim a free cursor slot in the consumer table. Finding a free entry
+        # and marking it active is a read-modify-write, so consumers starting
+        # together serialize on a lock over the segment file
+        self.index = None
+        with _segment_lock(self.shm.name):
+            for i in range(self.max_consumers):
+                offset = HEADER_SIZE + i * CONSUMER.size
+                active, pid, _ = CONSUMER.unpack_from(self.buf, offset)
+                if not active or not self._pid_alive(pid):
+                    self.index = i
+                    break
+            if self.index is None:
+                self.close()
+                raise RuntimeError(f"All {self.max_consumers} consumer slots of '{name}' are in use")
+
+            write_seq = self.write_seq
+            self.read_seq = max(0, write_seq - self.slot_count) if from_start else write_seq
+            self._cursor_offset = HEADER_SIZE + self.index * CONSUMER.size
+            CONSUMER.pack_into(self.buf, self._cursor_offset, 1, os.getpid(), self.read_seq)
+
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _take(self):
+        """Copy the next message out of the ring, or None if caught up"""
+        write_seq = self.write_seq
+        if self.read_seq >= write_seq:
+            return None
+        if write_seq - self.read_seq > self.slot_count:
+            # Lapped by the producer: skip to the oldest message still stored
+            skipped = write_seq - self.slot_count - self.read_seq
+            self.dropped += skipped
+            self.read_seq += skipped
+
+        offset = self._slot_offset(self.read_seq)
+        seq, length = SLOT.unpack_from(self.buf, offset)
+        data = bytes(self.buf[offset + SLOT.size:offset + SLOT.size + length])
+        # Seqlock re-check: the copy is only valid if the slot still holds the
+        # sequence we expected (0 means the producer is rewriting it)
+        if SLOT.unpack_from(self.buf, offset)[0] != seq or seq != self.read_seq + 1:
+            # Overwritten while copying
+            self.dropped += 1
+            self.read_seq += 1
+            return self._take()
+
+        self.read_seq += 1
+        struct.pack_into("=Q", self.buf, self._cursor_offset + 8, self.read_seq)
+        return data
+
+    def _reattach(self):
+        """Map the segment now under our name; False while there is none yet"""
+        try:
+            shm = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        if shm.size < HEADER.size or HEADER.unpack_from(shm.buf, 0)[0] != MAGIC:
+            shm.close()  # created but not initialized yet
+            return False
+        dropped, reattached = self.dropped, self.reattached + 1
+        self.close()
+        shm.close()
+        # Everything still stored in the new segment is new to us
+        self.__init__(self.name, from_start=True)
+        self.dropped, self.reattached = dropped, reattached
+        return True
+
+    def read(self, timeout=None):
+        """Return the next message, sleeping on the futex until one arrives"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.shm is not None:
+                expected = self._futex.value
+                data = self._take()
+                if data is not None:
+                    return data
+            if self.shm is None or self.generation != self._generation:
+                # Drained a segment its producer retired: follow the name
+                if not self._reattach():
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return None
+                    time.sleep(0.1)
+                continue
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+            futex_wait(self.futex_address, expected, remaining)
+
+    def close(self):
+        """Release the cursor slot and detach"""
+        if self.shm is not None and getattr(self, '_cursor_offset', None) is not None:
+            CONSUMER.pack_into(self.buf, self._cursor_offset, 0, 0, 0)
+        super().close()
+
+def _bench_consumer(name, count):
+    """Benchmark child: report receive latency of timestamped messages"""
+    consumer = RingConsumer(name)
+    print("ready", flush=True)
+    latencies = []
+    while len(latencies) < count:
+        data = consumer.read(timeout=2.0)
+        if data is None:
+            break
+        latencies.append(time.monotonic_ns() - int(data))
+    latencies.sort()
+    print(len(latencies), consumer.dropped, latencies[len(latencies) // 2],
+          latencies[int(len(latencies) * 0.99)], latencies[-1], flush=True)
+    consumer.close()
+
+def main():
+    import subprocess
+    import sys
+
+    if len(sys.argv) == 4 and sys.argv[1] == "--consume":
+        _bench_consumer(sys.argv[2], int(sys.argv[3]))
+        return
+
+    name, count = "autobbb_bench", 2000
+    print("📡 Command ring latency benchmark")
+    print("================================")
+    producer = RingProducer(name=name)
+    workers = [subprocess.Popen([sys.executable, __file__, "--consume", name, str(count)],
+                                stdout=subprocess.PIPE, text=True) for _ in range(2)]
+    try:
+        for w in workers:
+            w.stdout.readline()  # wait for "ready"
+        for _ in range(count):
+            producer.publish(str(time.monotonic_ns()))
+            time.sleep(0.0005)
+        for i, w in enumerate(workers):
+            received, dropped, p50, p99, worst = map(int, w.stdout.readline().split())
+            print(f"consumer {i}: {received} received, {dropped} dropped, "
+                  f"p50={p50 / 1000:.1f}us p99={p99 / 1000:.1f}us max={worst / 1000:.1f}us")
+    finally:
+        for w in workers:
+            w.wait(timeout=5)
+        producer.unlink()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Opt-in real-time mode for the control/PWM threads on the BeagleBone Black
+SCHED_FIFO priority, CPU affinity, mlockall and GIL switch interval,
+with graceful fallback when privileges are missing
+"""
+
+import os
+import sys
+import threading
+import time
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+THREAD_STACK_SIZE = 256 * 1024  # MCL_FUTURE locks every later thread's whole stack
+
+def lock_memory():
+    """mlockall(MCL_CURRENT | MCL_FUTURE) so page faults can't stall the loop"""
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+def enable_realtime(priority=50, cpus=None, mlock=True, switch_interval=0.001):
+    """Put the calling thread under SCHED_FIFO; returns what was applied"""
+    status = {'sched_fifo': False, 'affinity': None, 'mlockall': False, 'stack_size': None,
+              'switch_interval': None}
+
+    try:
+        # pid 0 = calling thread on Linux
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        status['sched_fifo'] = True
+        print(f"⚡ SCHED_FIFO priority {priority} enabled")
+    except (AttributeError, PermissionError, OSError) as e:
+        print(f"⚠️  SCHED_FIFO unavailable, staying on CFS: {e}")
+
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(0, set(cpus))
+            status['affinity'] = sorted(os.sched_getaffinity(0))
+            print(f"📌 Pinned to CPU(s) {status['affinity']}")
+        except (AttributeError, OSError) as e:
+            print(f"⚠️  Could not set CPU affinity: {e}")
+
+    if mlock:
+        try:
+            # Default pthread stacks are 8 MiB, all of it resident once locked
+            threading.stack_size(THREAD_STACK_SIZE)
+            status['stack_size'] = THREAD_STACK_SIZE
+        except (ValueError, RuntimeError) as e:
+            print(f"⚠️  Thread stack size unchanged: {e}")
+        try:
+            lock_memory()
+            status['mlockall'] = True
+            print("🔒 Memory locked (mlockall)")
+        except OSError as e:
+            print(f"⚠️  mlockall failed: {e}")
+
+    if switch_interval is not None:
+        sys.setswitchinterval(switch_interval)
+        status['switch_interval'] = sys.getswitchinterval()
+
+    return status
+
+def measure_jitter(rate_hz=1000, duration=2.0):
+    """Sleep to absolute deadlines and report wakeup lateness in microseconds"""
+    period = 1.0 / rate_hz
+    samples = []
+    next_deadline = time.monotonic() + period
+    end = next_deadline + duration
+    while next_deadline < end:
+        delay = next_deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        samples.append((time.monotonic() - next_deadline) * 1e6)
+        next_deadline += period
+
+    samples.sort()
+    return {
+        'samples': len(samples),
+        'avg_us': sum(samples) / len(samples),
+        'p50_us': samples[len(samples) // 2],
+        'p99_us': samples[int(len(samples) * 0.99)],
+        'max_us': samples[-1],
+    }
+
+def print_jitter(label, stats):
+    print(f"{label:>10}: avg={stats['avg_us']:.1f}us p50={stats['p50_us']:.1f}us "
+          f"p99={stats['p99_us']:.1f}us max={stats['max_us']:.1f}us ({stats['samples']} samples)")
+
+def main():
+    print("⏱️ Control loop jitter: CFS vs real-time mode")
+    print("=============================================")
+    print_jitter("normal", measure_jitter())
+
+    status = enable_realtime(priority=50, cpus=[0])
+    print_jitter("realtime" if status['sched_fifo'] else "fallback", measure_jitter())
+
+if __name__ == "__main__":
+    main()
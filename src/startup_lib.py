@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Startup timing for the BeagleBone Black toy-car
+Per-phase wall-clock breakdown measured from process exec, so boot-to-
+connectable time can be tracked as the startup pipeline changes, plus
+per-module import cost and a cold-import budget benchmark
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_IMPORT_BUDGET_MS = 250.0  # BBB eMMC, fresh interpreter
+RUNTIME_MODULES = ("bt_lib", "ring_lib", "actuator_run")  # auto_run's import closure
+
+def process_age_s():
+    """Seconds since this process was exec'd (from /proc/self/stat)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime) counts clock ticks since boot; comm may hold spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+class ImportTimer:
+    """-X importtime-style cost per module, via a builtins.__import__ wrapper"""
+
+    def __init__(self, startup):
+        self.startup = startup
+        self.records = []  # (name, self_s, cumulative_s, depth)
+        self._local = threading.local()
+        self._original = None
+
+    def install(self):
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        if level == 0 and name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)  # time spent in nested imports
+        start = self.startup.now()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            end = self.startup.now()
+            children = stack.pop()
+            cumulative = end - start
+            if level:
+                # Relative import: record the absolute module name
+                package = (globals or {}).get('__package__') or ""
+                base = package.rsplit(".", level - 1)[0]
+                name = f"{base}.{name}" if name else f"{base}.{','.join(fromlist or ())}"
+            if stack:
+                stack[-1] += cumulative
+            else:
+                self.startup.add(f"import {name}", start, end)
+            self.records.append((name, cumulative - children, cumulative, len(stack)))
+
+    def report(self, top=8):
+        print("  slowest imports (self / cumulative):")
+        for name, self_s, cumulative_s, depth in sorted(self.records, key=lambda r: -r[1])[:top]:
+            print(f"    {name:30s} {self_s * 1000:7.1f}ms {cumulative_s * 1000:7.1f}ms")
+
+class StartupTimer:
+    """Record named startup phases and instants from any thread"""
+
+    def __init__(self):
+        self.t0 = time.monotonic() - process_age_s()  # process exec on the monotonic clock
+        self.phases = []  # (name, start_s, end_s or None, thread)
+        self.lock = threading.Lock()
+        self.imports = None
+
+    def track_imports(self):
+        """Record the cost of every module imported from now on"""
+        self.imports = ImportTimer(self)
+        self.imports.install()
+
+    def add(self, name, start_s, end_s=None, thread=None):
+        """Record a phase (or an instant when end_s is None), times from exec"""
+        with self.lock:
+            self.phases.append((name, start_s, end_s, thread or threading.current_thread().name))
+
+    def now(self):
+        return time.monotonic() - self.t0
+
+    @contextmanager
+    def phase(self, name):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.now())
+
+    def mark(self, name):
+        """Instant event, e.g. 'connectable'"""
+        self.add(name, self.now())
+
+    def report(self):
+        print("⏱️  Startup timing (from process exec)")
+        print(f"  {'phase':24s} {'start':>9s} {'took':>9s}  thread")
+        with self.lock:
+            phases = sorted(self.phases, key=lambda p: p[1])
+        for name, start, end, thread in phases:
+            took = f"{(end - start) * 1000:7.1f}ms" if end is not None else f"{'—':>9s}"
+            print(f"  {name:24s} {start * 1000:7.1f}ms {took}  {thread}")
+        if self.imports and self.imports.records:
+            self.imports.report()
+
+def cold_import_ms(modules=RUNTIME_MODULES, drop_caches=False):
+    """Import modules in a fresh interpreter; returns (ms, -X importtime lines)"""
+    import subprocess
+    if drop_caches:
+        # Root only: makes the next run read every .py/.pyc from eMMC again
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3")
+    code = ("import time; t = time.perf_counter(); import " + ", ".join(modules) +
+            "; print((time.perf_counter() - t) * 1000)")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr.splitlines()
+
+def main():
+    # python3 startup_lib.py [budget_ms] [--drop-caches]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    budget_ms = float(args[0]) if args else DEFAULT_IMPORT_BUDGET_MS
+    drop_caches = "--drop-caches" in sys.argv
+
+    print("⏱️  Cold-import budget for the runtime entry points")
+    print("=" * 50)
+    runs = [cold_import_ms(drop_caches=drop_caches) for _ in range(5)]
+    best_ms, lines = min(runs, key=lambda r: r[0])
+    print(f"{', '.join(RUNTIME_MODULES)}: best {best_ms:.1f}ms of {len(runs)} "
+          f"fresh interpreters (worst {max(r[0] for r in runs):.1f}ms), budget {budget_ms:.0f}ms")
+
+    # Largest cumulative costs from -X importtime of the best run
+    entries = []
+    for line in lines:
+        fields = line[len("import time:"):].split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[0].strip().isdigit():
+            entries.append((int(fields[1]), int(fields[0]), fields[2].strip()))
+    for cumulative_us, self_us, name in sorted(entries, reverse=True)[:8]:
+        print(f"  {name:30s} self {self_us / 1000:6.1f}ms  cumulative {cumulative_us / 1000:6.1f}ms")
+
+    if best_ms > budget_ms:
+        print("❌ Cold-import time over budget")
+        sys.exit(1)
+    print("✅ Within budget")
+
+if __name__ == "__main__":
+    main()
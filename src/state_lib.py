@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Desired-state sync for the BeagleBone Black toy-car
+One 'state' frame carries the whole output vector; only the fields that
+differ from the shadow state are written, and a hash of the result comes back
+
+    state left=40 right=40 lamps=0 gpio=0 effect=-
+    -> STATE <crc32 of "left=40,right=40,lamps=0,gpio=0,effect=-"> <changed>
+    state        -> STATE <hash>
+    state get    -> STATE <hash> left=40 right=40 ...
+"""
+
+import math
+import threading
+import zlib
+
+def _text(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+def parse_percent(text):
+    """Duty in percent; nan/inf or anything outside 0..100 is rejected"""
+    value = float(text)
+    if not math.isfinite(value) or not 0 <= value <= 100:
+        raise ValueError(f"duty must be 0..100, got {text}")
+    return value
+
+class _Field:
+    __slots__ = ('name', 'read', 'write', 'parse', 'batched')
+
+    def __init__(self, name, read, write, parse, batched):
+        self.name = name
+        self.read = read  # () -> current shadow value
+        self.write = write  # (value) -> None
+        self.parse = parse  # text -> value, ValueError if invalid
+        self.batched = batched  # written inside the single locked pass
+
+class StateSync:
+    """Diff a desired output vector against the shadow state and apply the deltas"""
+
+    def __init__(self, lock=None):
+        self.lock = lock or threading.RLock()  # pass DeadlineScheduler.lock
+        self.fields = {}  # in registration order, which is also the hash order
+        self.frames = 0
+        self.writes = 0
+
+    def add_field(self, name, read, write, parse=float, batched=True):
+        """Register an output; batched=False for slow writes kept outside the tick lock"""
+        self.fields[name] = _Field(name, read, write, parse, batched)
+
+    def snapshot(self):
+        return {name: field.read() for name, field in self.fields.items()}
+
+    def state_hash(self, values=None):
+        values = self.snapshot() if values is None else values
+        text = ",".join(f"{name}={_text(value)}" for name, value in values.items())
+        return f"{zlib.crc32(text.encode()):08x}"
+
+    def apply(self, desired):
+        """Write every field whose desired value differs; returns the number written"""
+        current = self.snapshot()
+        deltas = [(self.fields[name], value) for name, value in desired.items()
+                  if value != current[name]]
+        # One pass under the tick lock: the control loop sees all changes together
+        with self.lock:
+            for field, value in deltas:
+                if field.batched:
+                    field.write(value)
+        for field, value in deltas:
+            if not field.batched:
+                field.write(value)
+        self.frames += 1
+        self.writes += len(deltas)
+        return len(deltas)
+
+    def parse(self, args):
+        """'name=value' pairs -> {name: value}; raises ValueError on anything unknown"""
+        desired = {}
+        for pair in args:
+            name, sep, text = pair.partition("=")
+            if not sep or name not in self.fields:
+                raise ValueError(f"unknown field '{name}'")
+            desired[name] = self.fields[name].parse(text)
+        return desired
+
+    def handle(self, args):
+        """BT dispatcher hook for 'state ...'; returns the reply"""
+        if not args:
+            return f"STATE {self.state_hash()}"
+        if args[0] == "get":
+            values = self.snapshot()
+            return f"STATE {self.state_hash(values)} " + " ".join(
+                f"{name}={_text(value)}" for name, value in values.items())
+        try:
+            changed = self.apply(self.parse(args))
+        except ValueError as e:
+            return f"STATE_ERROR {e}"
+        return f"STATE {self.state_hash()} {changed}"
+
+    def get_stats(self):
+        return {
+            'frames': self.frames,
+            'writes': self.writes,
+            'hash': self.state_hash(),
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Timeline engine for the BeagleBone Black toy-car
+Time-stamped per-channel setpoint schedules, uploaded in chunks over GATT
+writes and played back locally on the deadline scheduler
+
+Upload protocol (one GATT write per line):
+    traj begin <points> <channels> [delta]
+    traj data <t_ms>:<v1>,<v2>,... [<t_ms>:<v1>,...]
+    traj end <checksum>          sum of every transmitted number & 0xffff
+    traj start [+<delay_ms>|@<board_ms>]
+    traj stop
+In delta mode each point's time and values are relative to the previous point.
+"""
+
+import threading
+import time
+from array import array
+from collections import deque
+
+MAX_POINTS = 1024
+MAX_CHANNELS = 4
+MAX_PENDING_NOTIFICATIONS = 16
+
+class Timeline:
+    """Preallocated schedule: times in ms and a row of channel values per point"""
+
+    def __init__(self, capacity=MAX_POINTS, max_channels=MAX_CHANNELS, name=""):
+        self.name = name
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.times_ms = array('l', [0]) * capacity
+        self.values = array('f', [0.0]) * (capacity * max_channels)
+        self.count = 0
+        self.channels = 0
+        self.outputs = None  # player writer index per channel; None = 0..channels-1
+
+    def clear(self, channels):
+        if not 1 <= channels <= self.max_channels:
+            raise ValueError(f"channels must be 1..{self.max_channels}")
+        self.count = 0
+        self.channels = channels
+
+    def append(self, t_ms, row):
+        """Add one point; raises ValueError when it does not fit or is invalid"""
+        if self.count >= self.capacity:
+            raise ValueError(f"more than {self.capacity} points")
+        if len(row) != self.channels:
+            raise ValueError(f"expected {self.channels} values, got {len(row)}")
+        if self.count and t_ms < self.times_ms[self.count - 1]:
+            raise ValueError(f"time {t_ms}ms goes backwards")
+        base = self.count * self.max_channels
+        for ch, value in enumerate(row):
+            if not 0 <= value <= 100:
+                raise ValueError(f"value {value} out of range 0..100")
+            self.values[base + ch] = value
+        self.times_ms[self.count] = int(t_ms)
+        self.count += 1
+
+    def value(self, index, channel):
+        return self.values[index * self.max_channels + channel]
+
+    @property
+    def duration_ms(self):
+        return self.times_ms[self.count - 1] if self.count else 0
+
+    @classmethod
+    def from_points(cls, points, channels, name="", outputs=None):
+        """Build a right-sized timeline from [(t_ms, [v1, v2, ...]), ...]"""
+        timeline = cls(capacity=max(1, len(points)), max_channels=channels, name=name)
+        timeline.clear(channels)
+        timeline.outputs = tuple(outputs) if outputs is not None else None
+        for t_ms, row in points:
+            timeline.append(t_ms, row)
+        return timeline
+
+class TimelinePlayer:
+    """Scheduler task that plays a Timeline onto channel writers"""
+
+    def __init__(self, writers, notify=None, on_stop=None, progress_steps=10, lock=None):
+        self.writers = writers  # one callable(value) per channel
+        self.notify = notify  # e.g. BT.send_to_iphone for progress, called off the tick
+        self.on_stop = on_stop  # e.g. release the arbiter source
+        self.progress_steps = progress_steps
+        # play()/stop() come from the dispatcher threads while update() runs
+        # on the tick: pass DeadlineScheduler.lock so they never interleave
+        self.lock = lock or threading.RLock()
+        self.timeline = None
+        self.playing = False
+        self.start_at = None
+        self.index = 0
+        self._writers = []  # writers in timeline channel order
+        self._last = [None] * len(writers)
+        self._next_progress = 0
+        # The tick only queues notifications; BLE I/O happens on this thread
+        self._pending = deque(maxlen=MAX_PENDING_NOTIFICATIONS)
+        self._wake = threading.Event()
+        self.dropped_notifications = 0
+        threading.Thread(target=self._notify_loop, name="timeline-notify", daemon=True).start()
+
+    def _notify_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._pending:
+                message = self._pending.popleft()
+                try:
+                    self.notify(message)
+                except Exception as e:
+                    print(f"⚠️  Timeline notification failed: {e}")
+
+    def _queue_notify(self, message):
+        if not self.notify:
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped_notifications += 1  # oldest progress update is dropped
+        self._pending.append(message)
+        self._wake.set()
+
+    def play(self, timeline, start_at=None):
+        """Start playback now or at a CLOCK_MONOTONIC time in seconds"""
+        outputs = timeline.outputs or range(timeline.channels)
+        if max(outputs) >= len(self.writers):
+            raise ValueError(f"timeline needs output {max(outputs)}, "
+                             f"only {len(self.writers)} outputs")
+        with self.lock:
+            # Replacing a running timeline releases its outputs like any other stop
+            self.stop(reason=None)
+            self._writers = [self.writers[i] for i in outputs]
+            self.timeline = timeline
+            self.index = 0
+            self._last = [None] * len(self.writers)
+            self._next_progress = 1
+            self.start_at = time.monotonic() if start_at is None else start_at
+            self.playing = True
+
+    def stop(self, reason="TRAJ_STOPPED"):
+        with self.lock:
+            if not self.playing:
+                return
+            self.playing = False
+            if self.on_stop:
+                self.on_stop()
+        if reason:
+            self._queue_notify(reason)
+
+    def update(self, dt=None):
+        """Control tick: apply every point whose time has come"""
+        with self.lock:
+            if not self.playing:
+                return
+            now = time.monotonic()
+            if now < self.start_at:
+                return
+            timeline = self.timeline
+            t_ms = (now - self.start_at) * 1000.0
+            index = self.index
+            row = None
+            while index < timeline.count and timeline.times_ms[index] <= t_ms:
+                row = index
+                index += 1
+            self.index = index
+
+            if row is not None:
+                for ch, write in enumerate(self._writers):
+                    value = timeline.value(row, ch)
+                    if value != self._last[ch]:
+                        write(value)
+                        self._last[ch] = value
+
+            if index >= timeline.count:
+                self.stop("TRAJ_DONE")
+            elif self.notify and self.progress_steps:
+                if index * self.progress_steps >= self._next_progress * timeline.count:
+                    self._next_progress = index * self.progress_steps // timeline.count + 1
+                    self._queue_notify(f"TRAJ_PROGRESS {index}/{timeline.count}")
+
+class TimelineUpload:
+    """Chunked 'traj' upload into double-buffered preallocated timelines"""
+
+    def __init__(self, player, capacity=MAX_POINTS, max_channels=MAX_CHANNELS):
+        self.player = player
+        self.buffers = [Timeline(capacity, max_channels, "upload0"),
+                        Timeline(capacity, max_channels, "upload1")]
+        self.staging = 0
+        self.ready = None  # last validated upload
+        self.expected = 0
+        self.delta = False
+        self.checksum = 0
+        self._prev = None
+        self.active = False
+
+    def _begin(self, args):
+        points, channels = int(args[0]), int(args[1])
+        buffer = self.buffers[self.staging]
+        if self.player.timeline is buffer:
+            self.player.stop()
+        if points > buffer.capacity:
+            raise ValueError(f"at most {buffer.capacity} points")
+        buffer.clear(channels)
+        self.expected = points
+        self.delta = len(args) > 2 and args[2] == "delta"
+        self.checksum = 0
+        self._prev = None
+        self.active = True
+        return "TRAJ_READY"
+
+    def _data(self, args):
+        if not self.active:
+            raise ValueError("no upload in progress")
+        buffer = self.buffers[self.staging]
+        for point in args:
+            t_text, _, values_text = point.partition(":")
+            t_ms = int(t_text)
+            row = [float(v) for v in values_text.split(",")]
+            self.checksum = (self.checksum + t_ms + sum(int(round(v)) for v in row)) & 0xffff
+            if self.delta and self._prev is not None:
+                t_ms += self._prev[0]
+                row = [prev + v for prev, v in zip(self._prev[1], row)]
+            buffer.append(t_ms, row)
+            self._prev = (t_ms, row)
+        return f"TRAJ_CHUNK {buffer.count}/{self.expected}"
+
+    def _end(self, args):
+        if not self.active:
+            raise ValueError("no upload in progress")
+        buffer = self.buffers[self.staging]
+        self.active = False
+        if buffer.count != self.expected:
+            raise ValueError(f"got {buffer.count} of {self.expected} points")
+        if args and int(args[0]) != self.checksum:
+            raise ValueError(f"checksum {args[0]} != {self.checksum}")
+        self.ready = buffer
+        self.staging ^= 1
+        return f"TRAJ_OK {buffer.count} {buffer.duration_ms}ms"
+
+    def _start(self, args):
+        if self.ready is None:
+            raise ValueError("nothing uploaded")
+        start_at = None
+        if args and args[0].startswith("+"):
+            start_at = time.monotonic() + int(args[0][1:]) / 1000.0
+        elif args and args[0].startswith("@"):
+            start_at = int(args[0][1:]) / 1000.0
+        self.player.play(self.ready, start_at)
+        return "TRAJ_STARTED"
+
+    def handle(self, args):
+        """BT dispatcher hook for 'traj ...'; returns the reply"""
+        if not args:
+            return "TRAJ_ERROR missing subcommand"
+        command, args = args[0], args[1:]
+        try:
+            if command == "begin":
+                return self._begin(args)
+            elif command == "data":
+                return self._data(args)
+            elif command == "end":
+                return self._end(args)
+            elif command == "start":
+                return self._start(args)
+            elif command == "stop":
+                self.player.stop(reason=None)
+                return "TRAJ_STOPPED"
+            return f"TRAJ_ERROR unknown {command}"
+        except (ValueError, IndexError) as e:
+            if command in ("begin", "data", "end"):
+                # A bad chunk leaves the upload unusable: the app starts over
+                self.active = False
+            return f"TRAJ_ERROR {e}"
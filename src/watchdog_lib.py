@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Dead-man watchdog for the BeagleBone Black toy-car
+Per-actuator command freshness deadlines on a hashed timer wheel
+"""
+
+import math
+import threading
+import time
+
+class TimerWheel:
+    """Hashed timer wheel with O(1) arm, re-arm and cancel"""
+
+    def __init__(self, tick_s=0.005, slots=256):
+        self.tick_s = tick_s
+        self.slots = slots
+        self.buckets = [dict() for _ in range(slots)]
+        self.timers = {}  # key -> (expiry_tick, deadline, callback)
+        self.origin = time.monotonic()
+        self.current_tick = 0
+
+    def _tick_of(self, t):
+        return int((t - self.origin) / self.tick_s)
+
+    def arm(self, key, timeout_s, callback, now=None):
+        """(Re-)arm a timer; callback(key, deadline) runs when it expires"""
+        now = time.monotonic() if now is None else now
+        old = self.timers.get(key)
+        if old is not None:
+            self.buckets[old[0] % self.slots].pop(key, None)
+        deadline = now + timeout_s
+        expiry_tick = max(self.current_tick + 1, math.ceil((deadline - self.origin) / self.tick_s))
+        entry = (expiry_tick, deadline, callback)
+        self.timers[key] = entry
+        self.buckets[expiry_tick % self.slots][key] = entry
+
+    def cancel(self, key):
+        entry = self.timers.pop(key, None)
+        if entry is not None:
+            self.buckets[entry[0] % self.slots].pop(key, None)
+
+    def advance(self, now=None):
+        """Expire every timer due up to now; returns the number fired"""
+        now = time.monotonic() if now is None else now
+        target = self._tick_of(now)
+        fired = 0
+        while self.current_tick < target:
+            self.current_tick += 1
+            bucket = self.buckets[self.current_tick % self.slots]
+            if not bucket:
+                continue
+            # Entries further out than one revolution stay for a later lap
+            due = [k for k, entry in bucket.items() if entry[0] <= self.current_tick]
+            for key in due:
+                expiry_tick, deadline, callback = bucket.pop(key)
+                del self.timers[key]
+                callback(key, deadline)
+                fired += 1
+        return fired
+
+class DeadmanWatchdog:
+    """Drop an actuator to its safe state when its commands stop arriving"""
+
+    def __init__(self, timeout_s=0.5, wheel=None, lock=None):
+        self.timeout_s = timeout_s
+        self.wheel = wheel or TimerWheel()
+        self.lock = lock or threading.RLock()  # pass DeadlineScheduler.lock
+        self.guards = {}  # name -> safe action
+        self.expiries = 0
+        self.latency_last_s = 0.0
+        self.latency_max_s = 0.0
+
+    def guard(self, name, safe_action):
+        """Register an actuator; safe_action() must write its safe value"""
+        self.guards[name] = safe_action
+
+    def feed(self, name):
+        """Fresh command for an actuator: push its deadline out"""
+        with self.lock:
+            self.wheel.arm(name, self.timeout_s, self._expire)
+
+    def wrap(self, name, fn):
+        """Wrap a hook so every call also feeds the actuator's deadline"""
+        def fed(*args):
+            self.feed(name)
+            return fn(*args)
+        return fed
+
+    def _expire(self, name, deadline):
+        self.guards[name]()
+        # Deadline -> safe value written to sysfs
+        latency = time.monotonic() - deadline
+        self.expiries += 1
+        self.latency_last_s = latency
+        if latency > self.latency_max_s:
+            self.latency_max_s = latency
+        print(f"🛑 Watchdog: {name} commands stale, forced to safe value ({latency * 1000:.1f}ms)")
+
+    def expire_all(self):
+        """Force every armed actuator safe now, e.g. on BLE disconnect"""
+        with self.lock:
+            now = time.monotonic()
+            for name in list(self.wheel.timers):
+                self.wheel.cancel(name)
+                self._expire(name, now)
+
+    def update(self, dt=None):
+        """Control tick task"""
+        with self.lock:
+            self.wheel.advance()
+
+    def get_stats(self):
+        return {
+            'timeout_s': self.timeout_s,
+            'armed': len(self.wheel.timers),
+            'expiries': self.expiries,
+            'expiry_latency_last_ms': self.latency_last_s * 1000,
+            'expiry_latency_max_ms': self.latency_max_s * 1000,
+        }